@@ -0,0 +1,132 @@
+# benchmarks/bench_change_tracker.py
+"""Golden check and timing of CourseChangeTracker against a SQLite copy of ups_courses.
+
+Fills the SQLite stand-in from catalog.py, then applies a scripted series
+of edits. After each edit, tracker.poll() must return None when nothing
+changed, and otherwise return exactly what a fresh fetch_courses_from_db()
+returns. The series includes edits stamped in the same second as the
+watermark, which leave MAX(updated_on), COUNT(*) and MAX(id) unchanged,
+down to a same-length rename and two rows swapping values. Exits non-zero
+on any difference. Also times an idle poll against a full fetch, right
+after loading a catalog whose rows all share one stamp and after edits.
+
+Usage: python benchmarks/bench_change_tracker.py [--rows 1000 100000] [--repeat 20]
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from catalog import TABLE_NAME, make_courses, make_sqlite
+
+STAMP = "2024-02-01 10:00:00"
+LATER = "2024-02-01 10:00:05"
+COMPARED = ["id", "course_name", "degree_id", "sequence"]
+
+
+def edits(rows):
+    """(description, SQL) steps; None is a poll with nothing changed"""
+    return [
+        ("nothing changed", None),
+        ("rename", f"UPDATE {TABLE_NAME} SET course_name = course_name || ' (Hons)', updated_on = '{STAMP}' "
+                   f"WHERE id = 2"),
+        ("deactivate, same second", f"UPDATE {TABLE_NAME} SET status = 'In-active', updated_on = '{STAMP}' "
+                                    f"WHERE id = 3"),
+        ("degree_id edit, same second", f"UPDATE {TABLE_NAME} SET degree_id = 99, updated_on = '{STAMP}' "
+                                        f"WHERE id = 4"),
+        ("second edit of one row, same second", f"UPDATE {TABLE_NAME} SET sequence = 7, updated_on = '{STAMP}' "
+                                                f"WHERE id = 4"),
+        ("reactivate, same second", f"UPDATE {TABLE_NAME} SET status = 'Active', updated_on = '{STAMP}' "
+                                    f"WHERE id = 3"),
+        ("same-length rename, same second", f"UPDATE {TABLE_NAME} SET course_name = SUBSTR(course_name, 2) || "
+                                            f"SUBSTR(course_name, 1, 1), updated_on = '{STAMP}' WHERE id = 2"),
+        ("two degree_ids, same second", f"UPDATE {TABLE_NAME} SET degree_id = CASE id WHEN 8 THEN 11 ELSE 12 END, "
+                                        f"updated_on = '{STAMP}' WHERE id IN (8, 9)"),
+        ("swap those degree_ids, same second", f"UPDATE {TABLE_NAME} SET degree_id = CASE id WHEN 8 THEN 12 "
+                                               f"ELSE 11 END, updated_on = '{STAMP}' WHERE id IN (8, 9)"),
+        ("nothing changed", None),
+        ("insert with an old stamp", f"INSERT INTO {TABLE_NAME} (id, course_name, degree_id, status, sequence, "
+                                     f"updated_on) VALUES ({rows + 1}, 'Diploma in Tracker Testing', 3, 'Active', 0, "
+                                     f"'2020-01-01 00:00:00')"),
+        ("later edit", f"UPDATE {TABLE_NAME} SET course_name = 'MBA (Executive)', updated_on = '{LATER}' "
+                       f"WHERE id = 5"),
+        ("hard delete", f"DELETE FROM {TABLE_NAME} WHERE id = 6"),
+        ("nothing changed", None),
+    ]
+
+
+def frame(df):
+    return df[COMPARED].sort_values("id").reset_index(drop=True)
+
+
+def check(rows, workdir, repeat):
+    """Failure descriptions for one catalog size, after printing its timings"""
+    from sqlalchemy import create_engine
+
+    import course_db
+    from course_suggestion_realtime import CourseChangeTracker
+
+    engine = create_engine(make_sqlite(workdir / "ups_courses.db", make_courses(rows, np.random.default_rng(0))))
+    tracker = CourseChangeTracker(engine)
+    tracker.load()
+
+    def timed(fn):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        return (time.perf_counter() - start) / repeat * 1e3
+
+    # Every row still carries make_courses()' one stamp, so every row is at the watermark
+    bulk_idle = timed(tracker.poll)
+
+    failures = []
+    for description, sql in edits(rows):
+        if sql is not None:
+            with engine.begin() as conn:
+                conn.exec_driver_sql(sql)
+        catalog = tracker.poll()
+        expected = course_db.clean_courses(course_db.fetch_active_courses(engine))
+        if sql is None:
+            if catalog is not None:
+                failures.append(f"{rows} rows, {description}: reported a change")
+        elif catalog is None:
+            failures.append(f"{rows} rows, {description}: change missed")
+        elif not frame(catalog).equals(frame(expected)):
+            failures.append(f"{rows} rows, {description}: catalog differs from a full fetch")
+
+    idle = timed(tracker.poll)
+    full = timed(lambda: course_db.clean_courses(course_db.fetch_active_courses(engine)))
+    print(f"{rows:>8} {bulk_idle:>12.2f}ms {idle:>9.2f}ms {full:>9.2f}ms {full / idle:>7.1f}x")
+    engine.dispose()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 100000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'bulk-load idle':>14} {'idle poll':>11} {'full fetch':>11} {'ratio':>8}")
+    failures = []
+    for rows in args.rows:
+        workdir = Path(tempfile.mkdtemp(prefix=f"course_tracker_{rows}_"))
+        try:
+            failures += check(rows, workdir, args.repeat)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    for line in failures:
+        print(f"  MISMATCH {line}")
+    print(f"{len(failures)} mismatches")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# benchmarks/bench_fuzzy.py
+"""Recall and speed of the trigram-prefiltered fuzzy fallback against the exhaustive WRatio scan.
+
+Catalogs are the active Courses.csv names, grown to each size with synthetic
+names recombined from their words. Queries are typo'd course names and
+words (deletions, swaps, substitutions, truncations). Recall is the share of
+exhaustive top-`limit` results (score >= cutoff) the prefiltered search also
+returns. Near the cutoff many names tie on score and either search may pick
+any of them, so "score recall" matches results by score (multiset
+intersection) and "exact" is the share of queries with identical lists.
+
+Usage: python benchmarks/bench_fuzzy.py [--rows 100 10000 100000] [--queries 300] [--min-overlap 0.2] [--max-candidates 2000]
+"""
+import argparse
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import trigram_index
+from catalog import catalog_names, typo_queries
+from trigram_index import TrigramIndex
+
+CUTOFF = 60
+LIMIT = 8
+
+
+def exhaustive(query, names):
+    return [(name, score, idx) for name, score, idx in
+            process.extract(query, names, scorer=fuzz.WRatio, limit=LIMIT) if score >= CUTOFF]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--min-overlap", type=float, default=trigram_index.MIN_OVERLAP)
+    parser.add_argument("--max-candidates", type=int, default=trigram_index.MAX_CANDIDATES)
+    args = parser.parse_args()
+    trigram_index.MIN_OVERLAP = args.min_overlap
+    trigram_index.MAX_CANDIDATES = args.max_candidates
+
+    rng = np.random.default_rng(0)
+    print(f"min overlap {args.min_overlap}, max candidates {args.max_candidates}, limit {LIMIT}, cutoff {CUTOFF}")
+    print(f"{'rows':>8} {'build':>8} {'exhaustive/q':>13} {'indexed/q':>10} {'speedup':>8} "
+          f"{'shortlist':>10} {'recall':>7} {'score recall':>13} {'exact':>6}")
+    for rows in args.rows:
+        names = catalog_names(rows, rng)
+        start = time.perf_counter()
+        index = TrigramIndex(names)
+        build = time.perf_counter() - start
+        queries = typo_queries(names, args.queries, rng)
+
+        start = time.perf_counter()
+        expected = [exhaustive(q, names) for q in queries]
+        t_exhaustive = (time.perf_counter() - start) / len(queries)
+        start = time.perf_counter()
+        found = [index.extract(q, LIMIT, score_cutoff=CUTOFF) for q in queries]
+        t_indexed = (time.perf_counter() - start) / len(queries)
+
+        hits = sum(len({r[2] for r in e} & {r[2] for r in f}) for e, f in zip(expected, found))
+        score_hits = sum(sum((Counter(r[1] for r in e) & Counter(r[1] for r in f)).values())
+                         for e, f in zip(expected, found))
+        total = sum(len(e) for e in expected)
+        exact = np.mean([[r[2] for r in e] == [r[2] for r in f] for e, f in zip(expected, found)])
+        shortlist = np.mean([len(s) if s is not None else rows for s in map(index.shortlist, queries)])
+        print(f"{rows:>8} {build:>7.2f}s {t_exhaustive * 1e3:>11.2f}ms {t_indexed * 1e3:>8.2f}ms "
+              f"{t_exhaustive / t_indexed:>7.1f}x {shortlist:>10.0f} {hits / max(total, 1):>7.1%} "
+              f"{score_hits / max(total, 1):>13.1%} {exact:>6.1%}")
+
+
+if __name__ == "__main__":
+    main()
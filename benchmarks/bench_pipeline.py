@@ -0,0 +1,78 @@
+# benchmarks/bench_pipeline.py
+"""Golden check and timing of the pipeline's early exit against running every stage.
+
+Fits the training vectorizers on the active courses in Courses.csv and runs
+every query through suggestion_pipeline.suggest() twice: as served (rule
+tiers skipped once the top-k is settled) and with every stage forced on
+(with_candidates=True). Exits non-zero if any top-k differs. Queries are
+every 1-8 character prefix of each course name and of each word in it, and
+every whole-word prefix of each name (see bench_rerank.golden_queries).
+
+Usage: python benchmarks/bench_pipeline.py [--repeat 3]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import suggestion_pipeline
+from bench_rerank import COURSE_COL, TOP_KS, build_catalog_snapshot, golden_queries
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return np.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    snapshot = build_catalog_snapshot()
+    queries = golden_queries(snapshot.courses[COURSE_COL].tolist())
+    cases = [(q, k) for q in queries for k in TOP_KS]
+
+    def served(q, k):
+        return suggestion_pipeline.suggest(q, snapshot, k)[0]
+
+    def full(q, k):
+        return suggestion_pipeline.suggest(q, snapshot, k, with_candidates=True)[0]
+
+    # Count the cases where the rule stage or its substring scan was skipped
+    calls = []
+    rule_matches = suggestion_pipeline.rule_matches
+    suggestion_pipeline.rule_matches = lambda *a, **kw: calls.append(kw.get("substring", True)) or rule_matches(*a, **kw)
+    mismatches = []
+    skipped_rule = skipped_scan = 0
+    for q, k in cases:
+        calls.clear()
+        if served(q, k) != full(q, k):
+            mismatches.append((q, k))
+        skipped_rule += len(calls) == 1
+        skipped_scan += calls[:1] == [False]
+    suggestion_pipeline.rule_matches = rule_matches
+
+    print(f"{len(cases)} cases over {len(queries)} queries and {len(snapshot.courses)} courses: "
+          f"{len(mismatches)} mismatches; rule stage skipped {skipped_rule}, substring scan skipped {skipped_scan}")
+    for q, k in mismatches[:20]:
+        print(f"  MISMATCH query={q!r} limit={k}")
+
+    t_full = timed(lambda: [full(q, k) for q, k in cases], args.repeat)
+    t_served = timed(lambda: [served(q, k) for q, k in cases], args.repeat)
+    print(f"all stages {t_full / len(cases) * 1e6:.1f}us/query, early exit {t_served / len(cases) * 1e6:.1f}us/query, "
+          f"{t_full / t_served:.2f}x")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# benchmarks/bench_rerank.py
+"""Golden check and timing of the array-based re-ranker against the per-candidate loop it replaced.
+
+Fits the training vectorizers on the active courses in Courses.csv (with a
+synthetic sequence, so ties exercise the display order), runs
+every query through both rankers on the same neighbours and exits non-zero
+if any result differs. Queries are every 1-8 character prefix of each course
+name and of each word in it, every whole-word prefix of each name ("diploma
+in"), plus a few abbreviations and typos.
+
+Usage: python benchmarks/bench_rerank.py [--repeat 3]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from course_db import clean_courses
+from index_snapshot import build_snapshot
+from similarity_engine import SimilarityEngine
+from suggestion_pipeline import fit_model, rank_neighbors, vectorize_queries
+from text_normalization import clean_text
+
+COURSE_COL = "course_name"
+TOP_KS = (8, 10, 20, 30)
+EXTRA_QUERIES = ["bttm", "engg", "mech engg", "managment", "enginering", "archtecture", "B.Com", "  Mba  ",
+                 "ph.d", "m.sc", "b tech", "btech", "computer science", "x", "zz", "1", "12", ".",
+                 "bachelor of", "diploma in", "master of", "Bachelor of Arts"]
+
+
+def rank_neighbors_reference(query, snapshot, distances, indices, top_k=8):
+    """The per-candidate loop of the original get_suggestions(), kept as the golden reference.
+
+    Prefix and word-start matches are the literal string checks, not the
+    snapshot's prefix index, so the check does not depend on the structures
+    under test. Ties sort by (sequence, name), the display order
+    CatalogPartitions.rank encodes.
+    """
+    query_normalized = clean_text(query)
+    query_no_dots = query_normalized.replace('.', '')
+    query_lower = query.lower().strip()
+
+    courses_df = snapshot.courses
+    suggestions = []
+
+    for dist, idx in zip(distances, indices):
+        if idx >= len(courses_df):
+            continue
+        course_name = courses_df.iloc[idx][COURSE_COL]
+        course_id = int(courses_df.iloc[idx]['id'])
+        sequence = int(courses_df.iloc[idx]['sequence'])
+        ml_score = max(0, int((1 - dist) * 100))
+
+        query_clean = query_no_dots
+        course_lower = course_name.lower().strip()
+        course_clean = clean_text(course_name)
+        course_no_dots = course_clean.replace('.', '')
+        word_start = any(word.startswith(query_clean) or word.startswith(query_no_dots)
+                         for word in course_clean.split())
+
+        boost = 0
+        if query_clean == course_clean:
+            boost = 100
+        elif course_lower.startswith(query_lower) or course_no_dots.startswith(query_clean):
+            boost = 90
+        elif word_start:
+            boost = 70
+        elif query_clean in course_clean or query_no_dots in course_no_dots:
+            boost = 30
+
+        final_score = min(100, ml_score + boost)
+
+        is_relevant = False
+        if len(query_clean) >= 3:
+            if boost > 0:
+                is_relevant = True
+        else:
+            if boost > 0 or ml_score >= 70:
+                is_relevant = True
+
+        if is_relevant and len(query_clean) >= 3:
+            has_connection = (
+                query_clean in course_clean or
+                query_no_dots in course_no_dots or
+                word_start or
+                query_clean == course_clean
+            )
+            if not has_connection and len(query_clean) <= 5:
+                if ml_score >= 80:
+                    has_connection = True
+            if not has_connection:
+                is_relevant = False
+
+        if is_relevant and final_score >= 40:
+            suggestions.append((course_name, course_id, final_score, sequence))
+
+    suggestions.sort(key=lambda x: (-x[2], x[3], x[0]))
+    return [suggestion[:3] for suggestion in suggestions[:top_k]]
+
+
+def build_catalog_snapshot():
+    df = pd.read_csv(ROOT / "Courses.csv")
+    df = clean_courses(df[df["status"] == "Active"][["id", COURSE_COL, "degree_id", "sequence"]].sort_values("id"))
+    # Every sequence in Courses.csv is 0; vary it so the (sequence, name) tie-break is exercised
+    df["sequence"] = df["id"] % 3
+    char_vectorizer, word_vectorizer, matrix = fit_model(df[COURSE_COL].tolist())
+    return build_snapshot(char_vectorizer, word_vectorizer, SimilarityEngine(matrix), df)
+
+
+def golden_queries(names):
+    queries = set(EXTRA_QUERIES)
+    for name in names:
+        words = name.split()
+        for text in [name] + words:
+            queries.update(text[:n] for n in range(1, 9))
+        # Prefixes across word boundaries ("diploma in"), which no single-word key holds
+        queries.update(" ".join(words[:n]) for n in range(2, len(words) + 1))
+    return sorted(q for q in queries if q.strip())
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return np.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    snapshot = build_catalog_snapshot()
+    queries = golden_queries(snapshot.courses[COURSE_COL].tolist())
+    max_k = min(max(TOP_KS) * 2, len(snapshot.courses))
+    distances, indices = snapshot.engine.kneighbors(vectorize_queries(snapshot, queries), n_neighbors=max_k)
+
+    cases = [(q, k, distances[i, :min(k * 2, max_k)], indices[i, :min(k * 2, max_k)])
+             for i, q in enumerate(queries) for k in TOP_KS]
+    mismatches = [
+        (q, k) for q, k, d, idx in cases
+        if rank_neighbors(q, snapshot, d, idx, k) != rank_neighbors_reference(q, snapshot, d, idx, k)
+    ]
+    print(f"{len(cases)} cases over {len(queries)} queries and {len(snapshot.courses)} courses: "
+          f"{len(mismatches)} mismatches")
+    for q, k in mismatches[:20]:
+        print(f"  MISMATCH query={q!r} top_k={k}")
+
+    t_loop = timed(lambda: [rank_neighbors_reference(q, snapshot, d, idx, k) for q, k, d, idx in cases], args.repeat)
+    t_array = timed(lambda: [rank_neighbors(q, snapshot, d, idx, k) for q, k, d, idx in cases], args.repeat)
+    print(f"loop {t_loop / len(cases) * 1e6:.1f}us/query, arrays {t_array / len(cases) * 1e6:.1f}us/query, "
+          f"{t_loop / t_array:.1f}x")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
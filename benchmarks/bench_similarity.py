@@ -0,0 +1,101 @@
+# benchmarks/bench_similarity.py
+"""Compare SimilarityEngine against the sklearn NearestNeighbors kneighbors path.
+
+Usage: python benchmarks/bench_similarity.py [--rows 1000 10000 100000] [--queries 200] [--k 16]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import hstack, vstack
+from sklearn.neighbors import NearestNeighbors
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from course_db import clean_courses
+from similarity_engine import SimilarityEngine
+from suggestion_pipeline import fit_model
+
+
+def load_artifacts():
+    """The training vectorizers and matrix fitted on the active courses in Courses.csv"""
+    df = pd.read_csv(ROOT / "Courses.csv")
+    names = clean_courses(df[df["status"] == "Active"][["id", "course_name"]].sort_values("id"))["course_name"].tolist()
+    char_vectorizer, word_vectorizer, matrix = fit_model(names)
+    return char_vectorizer, word_vectorizer, matrix.tocsr(), names
+
+
+def scale_matrix(matrix, rows, rng):
+    """Tile the catalog up to `rows` rows, dropping random features so copies are not identical"""
+    tiles = []
+    total = 0
+    while total < rows:
+        tile = matrix.copy()
+        tile.data = tile.data * (rng.random(tile.nnz) > 0.1)
+        tile.eliminate_zeros()
+        tiles.append(tile)
+        total += tile.shape[0]
+    return vstack(tiles).tocsr()[:rows]
+
+
+def queries_for(names, count, rng):
+    picks = rng.choice(len(names), size=count)
+    return [names[i][:rng.integers(1, 8)].lower() for i in picks]
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return np.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    char_vectorizer, word_vectorizer, matrix, names = load_artifacts()
+    queries = queries_for(names, args.queries, rng)
+    X_query = hstack([char_vectorizer.transform(queries), word_vectorizer.transform(queries)]).tocsr()
+
+    print(f"{'rows':>8} {'kneighbors/q':>14} {'engine/q':>10} {'engine batch/q':>15} {'speedup':>8} {'top-1 agree':>12}")
+    for rows in args.rows:
+        X = scale_matrix(matrix, rows, rng)
+        nn = NearestNeighbors(metric="cosine").fit(X)
+        engine = SimilarityEngine(X)
+        k = min(args.k, rows)
+
+        def sklearn_loop():
+            return [nn.kneighbors(X_query[i], n_neighbors=k) for i in range(X_query.shape[0])]
+
+        def engine_loop():
+            return [engine.kneighbors(X_query[i], n_neighbors=k) for i in range(X_query.shape[0])]
+
+        def engine_batch():
+            return engine.kneighbors(X_query, n_neighbors=k)
+
+        t_sklearn = timed(sklearn_loop, args.repeat) / len(queries)
+        t_engine = timed(engine_loop, args.repeat) / len(queries)
+        t_batch = timed(engine_batch, args.repeat) / len(queries)
+
+        d_ref, _ = nn.kneighbors(X_query, n_neighbors=k)
+        d_new, _ = engine_batch()
+        agree = np.mean(np.isclose(d_ref[:, 0], d_new[:, 0]))
+
+        print(f"{rows:>8} {t_sklearn * 1e3:>12.3f}ms {t_engine * 1e3:>8.3f}ms {t_batch * 1e3:>13.3f}ms "
+              f"{t_sklearn / t_engine:>7.1f}x {agree:>11.0%}")
+
+
+if __name__ == "__main__":
+    main()
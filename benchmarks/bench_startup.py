@@ -0,0 +1,127 @@
+# benchmarks/bench_startup.py
+"""Measure API process startup: module import and index open.
+
+Every step runs in a fresh interpreter so nothing is already imported or
+cached in-process (the OS page cache stays warm after the first run), and
+reports its time and the anonymous (heap) memory it added, which workers
+cannot share. When COURSE_INDEX_DIR has no index yet, one is built from
+Courses.csv in a temporary directory first; --rows builds a synthetic
+catalog of that size instead (see catalog.py).
+
+Usage: python benchmarks/bench_startup.py [--repeat 5] [--index-dir DIR | --rows 100000]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# name -> (untimed setup, timed code). The loading step imports its modules during setup,
+# so it is timed on loading alone.
+LOAD_SETUP = "import sklearn.feature_extraction.text, course_suggestion_realtime as c"
+STEPS = {
+    "import course_suggestion_realtime": ("", "import course_suggestion_realtime"),
+    "import ml_api": ("", "import ml_api"),
+    "open index (init)": (LOAD_SETUP, "c.init(monitor=False)"),
+    # With the API listening: its caches are reset and the build's hot set is read back
+    "open index (init, ml_api)": (LOAD_SETUP + ", ml_api", "c.init(monitor=False)"),
+}
+
+# Runs `setup` untimed, then `code`; prints seconds, the anonymous memory added (Linux) and the thread count
+RUNNER = """
+import json, threading, time
+
+def anonymous_mb():
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith("Anonymous:")) / 1024
+    except OSError:
+        return float("nan")
+
+{setup}
+before = anonymous_mb()
+start = time.perf_counter()
+{code}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "anonymous_mb": anonymous_mb() - before,
+                  "threads": threading.active_count()}}))
+"""
+
+
+def build_index(index_dir):
+    """Fit the training vectorizers on Courses.csv and write an index to `index_dir`"""
+    import pandas as pd
+
+    from course_db import clean_courses
+    from index_artifact import write_index
+    from suggestion_pipeline import fit_model
+
+    df = pd.read_csv(ROOT / "Courses.csv")
+    df = clean_courses(df[df["status"] == "Active"][["id", "course_name"]].sort_values("id"))
+    char_vectorizer, word_vectorizer, matrix = fit_model(df["course_name"].tolist())
+    write_index(char_vectorizer, word_vectorizer, matrix, df, index_dir)
+
+
+def build_synthetic_index(index_dir, rows):
+    """Stream a `rows`-row synthetic catalog through index_builder.build_index() into `index_dir`"""
+    from catalog import make_courses
+    from index_builder import build_index as build_streaming
+
+    df = make_courses(rows, np.random.default_rng(0))
+    df = df[df["status"] == "Active"][["id", "course_name", "degree_id", "sequence"]]
+    build_streaming((df.iloc[start:start + 20000] for start in range(0, len(df), 20000)), index_dir)
+
+
+def run_step(code, env, setup=""):
+    output = subprocess.run(
+        [sys.executable, "-c", RUNNER.format(setup=setup, code=code)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--index-dir", type=Path, default=None)
+    source.add_argument("--rows", type=int, default=None, help="time a synthetic catalog of this many rows")
+    args = parser.parse_args()
+
+    from index_artifact import INDEX_DIR, read_manifest
+
+    env = dict(os.environ)
+    index_dir = args.index_dir or INDEX_DIR
+    temporary = args.rows is not None or read_manifest(index_dir) is None
+    if temporary:
+        index_dir = Path(tempfile.mkdtemp(prefix="course_index_"))
+        if args.rows is None:
+            build_index(index_dir)
+            print(f"Built a benchmark index from Courses.csv in {index_dir}")
+        else:
+            build_synthetic_index(index_dir, args.rows)
+            print(f"Built a {args.rows}-row synthetic benchmark index in {index_dir}")
+    env["COURSE_INDEX_DIR"] = str(index_dir)
+
+    print(f"{'step':<36} {'median':>10} {'min':>10} {'heap':>9} {'threads':>8}")
+    for name, (setup, code) in STEPS.items():
+        runs = [run_step(code, env, setup) for _ in range(args.repeat)]
+        seconds = [run["seconds"] for run in runs]
+        heap = np.median([run["anonymous_mb"] for run in runs])
+        print(f"{name:<36} {np.median(seconds) * 1e3:>8.1f}ms {min(seconds) * 1e3:>8.1f}ms {heap:>6.0f} MB "
+              f"{runs[-1]['threads']:>8}")
+
+    if temporary:
+        shutil.rmtree(index_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
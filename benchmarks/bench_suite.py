@@ -0,0 +1,243 @@
+# benchmarks/bench_suite.py
+"""Latency, throughput and memory of the suggestion hot paths on synthetic catalogs, with baselines.
+
+For each catalog size a SQLite ups_courses stand-in is filled from
+catalog.py. The index is built by the real retrain_course_model.py
+against it. Every workload then runs in a fresh interpreter per size:
+
+    ml          suggestion_pipeline.get_suggestions (TF-IDF neighbours + boosts)
+    rule        suggestion_pipeline.rule_matches (prefix index + substring scan)
+    fuzzy       TrigramIndex.extract, the fuzzy fallback
+    endpoint    GET /api/suggest through the Flask test client, cache cleared per request,
+                hot set off (so results stay comparable with older baselines)
+    filtered    the same with ?degree_id= of the largest degree partition
+    hot         endpoint with the hot set on: short prefixes are a dict lookup
+    cached      the endpoint requests again, answered from the suggestion cache (hot set off)
+    hash        get_courses_hash() against the SQLite table
+    retrain     retrain_course_model.py as a subprocess
+
+Queries are keystroke prefixes and typos of catalog names. Latency is
+reported as p50/p95/p99 and throughput as calls (or catalog rows for hash
+and retrain) per second. Memory is the largest tracemalloc peak of one
+call, measured in a separate untimed pass; for retrain it is the peak RSS
+of the subprocess.
+
+--save writes the results as a baseline. --compare reads one and exits
+non-zero when any p95 or memory peak grows, or any throughput drops, by
+more than --tolerance.
+
+Usage: python benchmarks/bench_suite.py [--rows 1000 10000 100000 1000000] [--queries 300]
+           [--save baseline.json] [--compare baseline.json] [--tolerance 0.25]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from catalog import keystroke_queries, make_courses, make_sqlite, typo_queries
+
+SIZES = (1000, 10000, 100000, 1000000)
+# Calls per workload are capped for the DB-bound ones, which scan the whole table
+HASH_CALLS = 10
+WARMUP_CALLS = 5
+# Regressions are judged on these; p50 and p99 are informational
+COMPARED = {"p95_ms": 1, "throughput": -1, "peak_mb": 1}
+
+
+def measure(fn, items, memory_items=20):
+    """Timings of fn(item) for every item, then the largest tracemalloc peak over a few calls"""
+    for item in items[:WARMUP_CALLS]:
+        fn(item)
+    latencies = []
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - start)
+
+    peak = 0
+    tracemalloc.start()
+    for item in items[:memory_items]:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        fn(item)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    return latencies, peak
+
+
+def summary(latencies, peak_bytes, units=1):
+    """p50/p95/p99 in ms, throughput in units per second, peak in MB"""
+    ms = np.asarray(latencies) * 1e3
+    return {
+        "calls": len(latencies),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "throughput": units * len(latencies) / float(np.sum(latencies)),
+        "peak_mb": peak_bytes / 2**20,
+    }
+
+
+def run_retrain(db_url, index_dir):
+    """Wall time and peak RSS (bytes) of retrain_course_model.py against the stand-in"""
+    env = dict(os.environ, COURSE_DB_URL=db_url, COURSE_INDEX_DIR=str(index_dir))
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "retrain_course_model.py"], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL)
+    # wait4 reports the child's own peak RSS (Linux and macOS)
+    _, status, usage = os.wait4(process.pid, 0)
+    seconds = time.perf_counter() - start
+    if os.waitstatus_to_exitcode(status) != 0:
+        raise RuntimeError("retrain_course_model.py failed")
+    scale = 1 if sys.platform == "darwin" else 1024
+    return seconds, usage.ru_maxrss * scale
+
+
+def run_size(rows, workdir, n_queries):
+    """Run in a child process: every in-process workload against one prepared catalog"""
+    os.environ["COURSE_DB_URL"] = (workdir / "db_url").read_text()
+    os.environ["COURSE_INDEX_DIR"] = str(workdir / "index")
+    import course_suggestion_realtime
+    import ml_api
+    import suggestion_pipeline
+    from index_builder import peak_rss_mb
+
+    snapshot = course_suggestion_realtime.current_snapshot()
+    ml_api.load_courses()
+    rng = np.random.default_rng(1)
+    names = snapshot.courses["course_name"].tolist()
+    queries = keystroke_queries(names, n_queries, rng)
+    typos = typo_queries(names, n_queries, rng)
+    limits = {q: ml_api.suggestion_limit(q) for q in queries + typos}
+    client = ml_api.app.test_client()
+
+    def endpoint(query, **params):
+        ml_api.suggestion_cache.clear()
+        return client.get("/api/suggest", query_string={"query": query, **params})
+
+    # Only the "hot" workload is answered from the hot set
+    hot_set = ml_api.hot_set
+    degree_rows = snapshot.partitions.degree_rows
+    largest_degree = max(degree_rows, key=lambda degree: len(degree_rows[degree]))
+
+    workloads = {
+        "ml": (lambda q: suggestion_pipeline.get_suggestions(q, snapshot, top_k=limits[q]), queries),
+        "rule": (lambda q: suggestion_pipeline.rule_matches(snapshot, q), queries),
+        "fuzzy": (lambda q: snapshot.fuzzy_index.extract(q, limits[q], suggestion_pipeline.FUZZY_CUTOFF), typos),
+        "endpoint": (endpoint, queries),
+        "filtered": (lambda q: endpoint(q, degree_id=largest_degree), queries),
+        "hot": (endpoint, queries),
+        "cached": (lambda q: client.get("/api/suggest", query_string={"query": q}), queries),
+    }
+    results = {}
+    for name, (fn, items) in workloads.items():
+        ml_api.hot_set = hot_set if name == "hot" else None
+        if name == "cached":
+            for query in items:
+                client.get("/api/suggest", query_string={"query": query})
+        results[name] = summary(*measure(fn, items))
+
+    hash_calls = [None] * (HASH_CALLS if rows <= 100000 else 3)
+    results["hash"] = summary(*measure(lambda _: course_suggestion_realtime.get_courses_hash(), hash_calls, 1),
+                              units=rows)
+    rss = peak_rss_mb()
+    results["process_rss_mb"] = rss[0] if rss else None
+    print(json.dumps(results))
+
+
+def prepare(rows, workdir):
+    """Fill the SQLite stand-in and build the index with the real retrain script"""
+    courses = make_courses(rows, np.random.default_rng(0))
+    db_url = make_sqlite(workdir / "ups_courses.db", courses)
+    (workdir / "db_url").write_text(db_url)
+    seconds, peak = run_retrain(db_url, workdir / "index")
+    return {"calls": 1, "p50_ms": seconds * 1e3, "p95_ms": seconds * 1e3, "p99_ms": seconds * 1e3,
+            "throughput": rows / seconds, "peak_mb": peak / 2**20}
+
+
+def compare(results, baseline, tolerance):
+    """Lines describing every metric that regressed by more than `tolerance`"""
+    regressions = []
+    for size, workloads in results.items():
+        for name, metrics in workloads.items():
+            base = baseline.get(size, {}).get(name)
+            if not isinstance(metrics, dict) or not base:
+                continue
+            for metric, direction in COMPARED.items():
+                old, new = base[metric], metrics[metric]
+                if old and (new - old) * direction / old > tolerance:
+                    regressions.append(f"{size} rows {name} {metric}: {old:.3g} -> {new:.3g} "
+                                       f"({(new - old) / old:+.0%})")
+    return regressions
+
+
+def print_results(results, baseline=None):
+    print(f"{'rows':>8} {'workload':>9} {'p50':>10} {'p95':>10} {'p99':>10} {'throughput':>16} {'peak':>9} "
+          f"{'p95 vs base':>12}")
+    for size, workloads in results.items():
+        for name, m in workloads.items():
+            if not isinstance(m, dict):
+                continue
+            unit = "rows/s" if name in ("hash", "retrain") else "/s"
+            base = (baseline or {}).get(size, {}).get(name)
+            delta = f"{(m['p95_ms'] - base['p95_ms']) / base['p95_ms']:+.0%}" if base else ""
+            print(f"{size:>8} {name:>9} {m['p50_ms']:>8.2f}ms {m['p95_ms']:>8.2f}ms {m['p99_ms']:>8.2f}ms "
+                  f"{m['throughput']:>9.0f} {unit:<6} {m['peak_mb']:>7.2f}MB {delta:>12}")
+        if workloads.get("process_rss_mb"):
+            print(f"{size:>8} {'':>9} API process peak RSS {workloads['process_rss_mb']:.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=list(SIZES))
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--save", type=Path, help="write the results to this baseline file")
+    parser.add_argument("--compare", type=Path, help="fail on regressions against this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--run-size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run_size:
+        return run_size(args.run_size, args.workdir, args.queries)
+
+    results = {}
+    for rows in args.rows:
+        workdir = Path(tempfile.mkdtemp(prefix=f"course_bench_{rows}_"))
+        try:
+            retrain = prepare(rows, workdir)
+            output = subprocess.run(
+                [sys.executable, __file__, "--run-size", str(rows), "--workdir", str(workdir),
+                 "--queries", str(args.queries)],
+                cwd=ROOT, capture_output=True, text=True, check=True
+            ).stdout
+            results[str(rows)] = dict(json.loads(output.strip().splitlines()[-1]), retrain=retrain)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        print(f"✅ {rows} rows done", file=sys.stderr)
+
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    print_results(results, baseline)
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=2, sort_keys=True))
+        print(f"💾 Baseline saved to {args.save}")
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"  REGRESSION {line}")
+        print(f"{len(regressions)} regressions beyond {args.tolerance:.0%} against {args.compare}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
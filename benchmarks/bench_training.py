@@ -0,0 +1,119 @@
+# benchmarks/bench_training.py
+"""Wall time and peak memory of the streaming index build against the in-memory one, plus a golden check.
+
+Catalogs are the active Courses.csv names, grown to each size with
+synthetic names (see catalog.py), with some duplicate and missing names
+mixed in. Each build runs in a fresh interpreter so peak RSS is its own:
+"in-memory" is clean_courses() + fit_model() + write_index(), "streaming"
+is index_builder.build_index() over CHUNK_ROWS-row chunks. Exits non-zero
+if the two builds differ in any array (floats compared to 1e-12).
+
+Usage: python benchmarks/bench_training.py [--rows 100 10000 100000] [--workers 4] [--chunk-rows 50000]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from catalog import catalog_names
+
+COURSE_COL = "course_name"
+
+
+def make_catalog(rows):
+    rng = np.random.default_rng(0)
+    names = pd.Series(catalog_names(rows, rng), dtype=object)
+    # About 1% repeated names (with padding, so stripping matters) and missing names
+    picks = rng.choice(len(names), size=max(1, rows // 100))
+    names[picks[::2]] = names[rng.choice(len(names), size=len(picks[::2]))].to_numpy() + " "
+    names[picks[1::2]] = None
+    return pd.DataFrame({"id": np.arange(1, rows + 1), COURSE_COL: names})
+
+
+def build(mode, rows, index_dir, workers, chunk_rows):
+    """Run in a child process: build one index and print its timings"""
+    from course_db import clean_courses
+    from index_artifact import write_index
+    from index_builder import build_index, peak_rss_mb
+    from suggestion_pipeline import fit_model
+
+    catalog = make_catalog(rows)
+    start = time.perf_counter()
+    if mode == "in-memory":
+        df = clean_courses(catalog)
+        char_vectorizer, word_vectorizer, matrix = fit_model(df[COURSE_COL].tolist())
+        write_index(char_vectorizer, word_vectorizer, matrix, df, index_dir)
+    else:
+        chunks = (catalog.iloc[i:i + chunk_rows] for i in range(0, len(catalog), chunk_rows))
+        build_index(chunks, index_dir, workers=workers)
+    seconds = time.perf_counter() - start
+    rss = peak_rss_mb() or (float("nan"), float("nan"))
+    print(json.dumps({"seconds": seconds, "rss_mb": rss[0], "worker_rss_mb": rss[1]}))
+
+
+def run_build(mode, rows, index_dir, workers, chunk_rows):
+    output = subprocess.run(
+        [sys.executable, __file__, "--build", mode, "--rows", str(rows), "--index-dir", str(index_dir),
+         "--workers", str(workers), "--chunk-rows", str(chunk_rows)],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def differences(dir_a, dir_b):
+    """Names of the arrays that differ between the published builds in two index directories"""
+    from index_artifact import read_manifest
+
+    build_a = dir_a / read_manifest(dir_a)["build"]
+    build_b = dir_b / read_manifest(dir_b)["build"]
+    differ = []
+    for path in sorted(build_a.glob("*.npy")):
+        a, b = np.load(path), np.load(build_b / path.name)
+        same = a.shape == b.shape and (np.allclose(a, b, rtol=0, atol=1e-12) if a.dtype.kind == "f"
+                                       else np.array_equal(a, b))
+        if not same:
+            differ.append(path.name)
+    return differ
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 10000, 100000])
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--chunk-rows", type=int, default=50000)
+    parser.add_argument("--build", choices=["in-memory", "streaming"], help=argparse.SUPPRESS)
+    parser.add_argument("--index-dir", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.build:
+        return build(args.build, args.rows[0], args.index_dir, args.workers, args.chunk_rows)
+
+    print(f"{args.workers} workers, {args.chunk_rows} rows per chunk")
+    print(f"{'rows':>8} {'mode':>10} {'wall':>8} {'peak RSS':>9} {'workers':>8}")
+    failed = False
+    for rows in args.rows:
+        dirs = {mode: Path(tempfile.mkdtemp(prefix=f"course_index_{mode}_")) for mode in ("in-memory", "streaming")}
+        for mode, index_dir in dirs.items():
+            result = run_build(mode, rows, index_dir, args.workers, args.chunk_rows)
+            print(f"{rows:>8} {mode:>10} {result['seconds']:>7.2f}s {result['rss_mb']:>6.0f} MB "
+                  f"{result['worker_rss_mb']:>5.0f} MB")
+        differ = differences(dirs["in-memory"], dirs["streaming"])
+        print(f"{'':>8} {'golden':>10} {'MISMATCH ' + ', '.join(differ) if differ else 'identical'}")
+        failed |= bool(differ)
+        for index_dir in dirs.values():
+            shutil.rmtree(index_dir, ignore_errors=True)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# benchmarks/catalog.py
+"""Synthetic course catalogs seeded from Courses.csv, plus a SQLite stand-in for ups_courses.
+
+Names beyond the real ones are recombined from the words of the active
+course names, so n-gram statistics stay close to the real catalog at any
+size. Rows keep the Courses.csv columns; a share of them is inactive.
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+COURSES_CSV = ROOT / "Courses.csv"
+TABLE_NAME = "ups_courses"
+INACTIVE_SHARE = 0.05
+
+
+def catalog_names(rows, rng):
+    """`rows` distinct names: the active Courses.csv names, then synthetic ones"""
+    df = pd.read_csv(COURSES_CSV)
+    names = df[df["status"] == "Active"]["course_name"].dropna().astype(str).str.strip().unique().tolist()
+    # Words with at least two letters or digits, so synthetic names read like course names
+    words = sorted({word for name in names for word in name.split() if sum(c.isalnum() for c in word) >= 2})
+    seen = set(names)
+    while len(names) < rows:
+        name = " ".join(rng.choice(words, size=rng.integers(2, 6), replace=False))
+        if name not in seen:
+            seen.add(name)
+            names.append(name)
+    return names[:rows]
+
+
+def typo(text, rng):
+    """`text` with one or two deletions, swaps, substitutions or truncations"""
+    chars = list(text)
+    for _ in range(rng.integers(1, 3)):
+        if len(chars) < 3:
+            break
+        i = rng.integers(0, len(chars) - 1)
+        kind = rng.integers(0, 4)
+        if kind == 0:
+            del chars[i]
+        elif kind == 1:
+            chars[i], chars[i + 1] = chars[i + 1], chars[i]
+        elif kind == 2:
+            chars[i] = chr(rng.integers(ord("a"), ord("z") + 1))
+        else:
+            chars = chars[:max(3, i)]
+    return "".join(chars)
+
+
+def typo_queries(names, count, rng):
+    """Typo'd course names and words, in mixed case"""
+    queries = []
+    for i in rng.choice(len(names), size=count):
+        name = names[i]
+        source = name if rng.random() < 0.5 else rng.choice(name.split())
+        queries.append(typo(source.lower() if rng.random() < 0.5 else source, rng))
+    return queries
+
+
+def keystroke_queries(names, count, rng):
+    """What users type: 1-8 character prefixes of names and of words in them, and some typos"""
+    queries = []
+    for i in rng.choice(len(names), size=count):
+        name = names[i]
+        source = name if rng.random() < 0.5 else rng.choice(name.split())
+        text = source[:rng.integers(1, 9)]
+        queries.append(typo(text, rng) if rng.random() < 0.1 else text)
+    return [q for q in queries if any(c.isalnum() for c in q)]
+
+
+def make_courses(rows, rng):
+    """A ups_courses-shaped DataFrame with `rows` rows (ids 1..rows), INACTIVE_SHARE of them inactive"""
+    seed = pd.read_csv(COURSES_CSV)
+    stamp = "2024-01-03 15:30:18"
+    return pd.DataFrame({
+        "id": np.arange(1, rows + 1),
+        "course_name": catalog_names(rows, rng),
+        "degree_id": rng.choice(seed["degree_id"].to_numpy(), size=rows),
+        "status": np.where(rng.random(rows) < INACTIVE_SHARE, "In-active", "Active"),
+        "sequence": 0,
+        "is_deleted": "No",
+        "created_by": 0,
+        "created_on": stamp,
+        "updated_on": stamp,
+        "updated_by": 0,
+    })
+
+
+def make_sqlite(path, courses):
+    """Write `courses` to a SQLite ups_courses table at `path`; returns its SQLAlchemy URL"""
+    from sqlalchemy import create_engine
+
+    url = f"sqlite:///{Path(path).resolve()}"
+    engine = create_engine(url)
+    courses.to_sql(TABLE_NAME, engine, index=False, if_exists="replace", chunksize=50000)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"CREATE UNIQUE INDEX {TABLE_NAME}_id ON {TABLE_NAME} (id)")
+        # Keeps the change tracker's per-poll checksum of the rows at the watermark cheap
+        conn.exec_driver_sql(f"CREATE INDEX {TABLE_NAME}_updated_on ON {TABLE_NAME} (updated_on)")
+    engine.dispose()
+    return url
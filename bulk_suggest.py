@@ -0,0 +1,242 @@
+# bulk_suggest.py
+"""Map a file of free-text course entries to ups_courses ids, offline.
+
+    python bulk_suggest.py entries.csv --column course --output matched.csv
+    python bulk_suggest.py entries.jsonl --output matched.jsonl --top-k 3 --workers 8
+
+Input is CSV (one column, the first by default), JSONL (a JSON string or an
+object per line) or plain text (one entry per line). Each chunk goes through
+suggestion_pipeline.suggest_batch(): the same normalization and ML + rule +
+fuzzy scoring as /api/suggest. Results are written in input order, as CSV
+(row, [id,] query, course_id_1, course_name_1, score_1, ...) or as JSONL
+with /api/suggest suggestion objects.
+
+No database is needed, only an index directory (--index-dir, default
+COURSE_INDEX_DIR). The parent opens the memory-mapped index snapshot
+before the pool forks (Linux), so workers share it instead of loading
+their own. At most WORKERS * 2 chunks are in flight and each worker
+keeps a bounded LRU of recent queries, so memory stays flat however long
+the input is.
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+import suggestion_pipeline
+from index_artifact import INDEX_DIR, open_snapshot
+from index_builder import ordered_map, peak_rss_mb
+from suggestion_cache import LRUCache
+
+# ========== CONFIG ==========
+CHUNK_ROWS = int(os.environ.get("COURSE_BULK_CHUNK_ROWS", 2000))
+WORKERS = int(os.environ.get("COURSE_BULK_WORKERS", os.cpu_count() or 1))
+TOP_K = 5
+# Results kept per worker; entries typed by hand repeat a lot
+CACHE_SIZE = 100000
+PROGRESS_SECONDS = 10
+
+# Per-process state, set by load() in the parent (inherited on fork) or by _init_worker()
+_snapshot = None
+_stages = None
+_cache = None
+
+
+def load(index_dir, stages=None):
+    """Open the published index in `index_dir` as this process's snapshot"""
+    global _snapshot, _stages, _cache
+    _snapshot = open_snapshot(index_dir)
+    if _snapshot is None:
+        sys.exit(f"No course index in {index_dir}. Run retrain_course_model.py or train_module.py first.")
+    _stages = stages
+    _cache = LRUCache(maxsize=CACHE_SIZE)
+    return _snapshot
+
+
+def _init_worker(index_dir, stages):
+    # Forked workers inherit the parent's snapshot; spawned ones open the index themselves
+    if _snapshot is None:
+        load(index_dir, stages)
+
+
+def is_valid_query(query):
+    """Same rule as the API: at least one letter or number"""
+    return re.search(r'[a-zA-Z0-9]', query) is not None
+
+
+def score_chunk(job):
+    """Top-k (name, id, score) suggestions for every query of one chunk, in order"""
+    queries, top_k = job
+    results = [[] for _ in queries]
+    # Case and surrounding whitespace are folded like the API cache key
+    pending = {}
+    for i, query in enumerate(queries):
+        query = query.strip()
+        if not is_valid_query(query):
+            continue
+        key = (query.lower(), top_k)
+        cached = _cache.get(key)
+        if cached is not None:
+            results[i] = cached
+        else:
+            pending.setdefault(key, (query, []))[1].append(i)
+
+    if pending:
+        batch = suggestion_pipeline.suggest_batch([query for query, _ in pending.values()], _snapshot,
+                                                  [top_k] * len(pending), _stages)
+        for (key, (_, rows)), suggestions in zip(pending.items(), batch):
+            _cache.put(key, suggestions)
+            for i in rows:
+                results[i] = suggestions
+    return results
+
+
+def input_format(path, given=None):
+    fmt = given or Path(path).suffix.lower().lstrip(".")
+    if fmt not in ("csv", "jsonl", "txt"):
+        sys.exit(f"Cannot tell the format of {path}; pass --format csv, jsonl or txt")
+    return fmt
+
+
+def read_entries(path, fmt, column=None, id_column=None):
+    """(entry id or None, text) for every input record, streamed"""
+    with open(path, newline="" if fmt == "csv" else None, encoding="utf-8") as f:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            column = column or reader.fieldnames[0]
+            if column not in reader.fieldnames:
+                sys.exit(f"{path} has no column {column!r}")
+            for record in reader:
+                yield record.get(id_column) if id_column else None, record[column] or ""
+        elif fmt == "jsonl":
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if isinstance(record, dict):
+                    entry_id = record.get(id_column) if id_column else None
+                    text = record.get(column) if column else next(iter(record.values()), "")
+                    yield entry_id, "" if text is None else str(text)
+                else:
+                    yield None, "" if record is None else str(record)
+        else:
+            for line in f:
+                yield None, line.rstrip("\r\n")
+
+
+class ResultWriter:
+    """Writes one output record per input record, as CSV or JSONL by the output suffix"""
+
+    def __init__(self, path, top_k, id_column=None):
+        self.fmt = "jsonl" if Path(path).suffix.lower() in (".jsonl", ".json") else "csv"
+        self.top_k = top_k
+        self.id_column = id_column
+        self._file = open(path, "w", newline="" if self.fmt == "csv" else None, encoding="utf-8")
+        if self.fmt == "csv":
+            self._csv = csv.writer(self._file)
+            header = ["row"] + ([id_column] if id_column else []) + ["query"]
+            for n in range(1, top_k + 1):
+                header += [f"course_id_{n}", f"course_name_{n}", f"score_{n}"]
+            self._csv.writerow(header)
+
+    def write(self, row, entry_id, query, suggestions):
+        if self.fmt == "csv":
+            record = [row] + ([entry_id] if self.id_column else []) + [query]
+            for name, course_id, score in suggestions:
+                record += [course_id, name, round(score, 2)]
+            record += [""] * (3 * (self.top_k - len(suggestions)))
+            self._csv.writerow(record)
+        else:
+            record = {"row": row, "query": query, "suggestions": [
+                {"course_id": course_id, "course_name": name, "confidence_percentage": round(score, 2)}
+                for name, course_id, score in suggestions
+            ]}
+            if self.id_column:
+                record[self.id_column] = entry_id
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def close(self):
+        self._file.close()
+
+
+def _pool(workers, index_dir, stages):
+    if workers <= 1:
+        return None
+    # Fork shares the parent's snapshot; elsewhere each worker loads the index once
+    context = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                               initargs=(index_dir, stages))
+
+
+def run(input_path, output_path, column=None, id_column=None, fmt=None, top_k=TOP_K, workers=WORKERS,
+        chunk_rows=CHUNK_ROWS, index_dir=INDEX_DIR, stages=None):
+    """Score every entry of `input_path` into `output_path`; returns the number of entries"""
+    snapshot = load(index_dir, stages)
+    print(f"✅ Loaded {len(snapshot.courses)} courses from {Path(index_dir) / snapshot.build}", file=sys.stderr)
+    fmt = input_format(input_path, fmt)
+    entries = read_entries(input_path, fmt, column, id_column)
+    writer = ResultWriter(output_path, top_k, id_column)
+
+    # Inputs of the chunks in flight, in submission order; ordered_map returns results in the same order
+    in_flight = deque()
+
+    def jobs():
+        while True:
+            chunk = list(islice(entries, chunk_rows))
+            if not chunk:
+                return
+            in_flight.append(chunk)
+            yield [text for _, text in chunk], top_k
+
+    start = last_report = time.perf_counter()
+    done = 0
+    pool = _pool(workers, index_dir, stages)
+    try:
+        for results in ordered_map(pool, score_chunk, jobs(), max(2, workers * 2)):
+            for (entry_id, text), suggestions in zip(in_flight.popleft(), results):
+                writer.write(done, entry_id, text, suggestions)
+                done += 1
+            now = time.perf_counter()
+            if now - last_report >= PROGRESS_SECONDS:
+                print(f"⏳ {done} entries, {done / (now - start):.0f}/s", file=sys.stderr)
+                last_report = now
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    rss = peak_rss_mb()
+    memory = f", peak RSS {rss[0]:.0f} MB (largest worker {rss[1]:.0f} MB)" if rss else ""
+    print(f"✅ {done} entries scored in {elapsed:.1f}s ({done / max(elapsed, 1e-9):.0f}/s) "
+          f"with {workers} workers{memory} -> {output_path}", file=sys.stderr)
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="CSV, JSONL or text file of free-text course entries")
+    parser.add_argument("--output", "-o", required=True, help="results file, .csv or .jsonl")
+    parser.add_argument("--column", help="CSV column or JSON key holding the text (default: the first)")
+    parser.add_argument("--id-column", help="CSV column or JSON key copied to the output, e.g. a resume id")
+    parser.add_argument("--format", choices=["csv", "jsonl", "txt"], help="input format (default: from the suffix)")
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--index-dir", type=Path, default=INDEX_DIR)
+    parser.add_argument("--stages", help="comma-separated pipeline stages (default: COURSE_SUGGEST_STAGES)")
+    args = parser.parse_args()
+    run(args.input, args.output, args.column, args.id_column, args.format, args.top_k, args.workers,
+        args.chunk_rows, args.index_dir, tuple(args.stages.split(",")) if args.stages else None)
+
+
+if __name__ == "__main__":
+    main()
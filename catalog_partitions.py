@@ -0,0 +1,87 @@
+# catalog_partitions.py
+import numpy as np
+import pandas as pd
+
+COURSE_COL = "course_name"
+# ups_courses columns carried through the index next to (id, course_name), with the value used when
+# a source has none (an index built before they were stored, or a catalog loaded without them)
+METADATA_DEFAULTS = {"degree_id": -1, "sequence": 0}
+
+
+def _inverse(order):
+    """Position of each row in `order`"""
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return rank
+
+
+def with_metadata(df):
+    """`df` with every METADATA_DEFAULTS column present as int64, missing values filled"""
+    df = df.copy()
+    for column, default in METADATA_DEFAULTS.items():
+        values = df[column] if column in df.columns else pd.Series(default, index=df.index)
+        df[column] = pd.to_numeric(values, errors="coerce").fillna(default).astype(np.int64)
+    return df
+
+
+class CatalogPartitions:
+    """Per-degree row sets and the display-order tie-break, precomputed once per catalog.
+
+    `courses` must hold id, course_name, degree_id and sequence in catalog
+    row order. Each degree maps to its sorted rows, so a filtered query
+    scores only that partition. `rank` orders rows by (sequence, name):
+    results with equal scores are sorted by it instead of comparing names.
+    The arrays are stored in each index build and come back memory-mapped
+    through from_arrays().
+    """
+    ARRAYS = ("by_degree", "degrees", "degree_starts", "rank", "id_order", "sorted_ids")
+
+    def __init__(self, courses):
+        degree_ids = courses["degree_id"].to_numpy(dtype=np.int64)
+        self._by_degree = np.argsort(degree_ids, kind="stable")
+        self._degrees, self._degree_starts = np.unique(degree_ids[self._by_degree], return_index=True)
+
+        # Names compare as Python strings, like the (-score, name) sort this replaces
+        name_rank = _inverse(np.argsort(courses[COURSE_COL].to_numpy(dtype=object), kind="stable"))
+        self._rank = _inverse(np.lexsort((name_rank, courses["sequence"].to_numpy(dtype=np.int64))))
+        ids = courses["id"].to_numpy(dtype=np.int64)
+        self._id_order = np.argsort(ids, kind="stable")
+        self._sorted_ids = ids[self._id_order]
+        self._split_degrees()
+
+    @property
+    def rank(self):
+        return self._rank
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Partitions over the arrays() of ones built for the same catalog"""
+        partitions = cls.__new__(cls)
+        for name in cls.ARRAYS:
+            setattr(partitions, f"_{name}", arrays[name])
+        partitions._split_degrees()
+        return partitions
+
+    def arrays(self):
+        """{name: array} for every name in ARRAYS"""
+        return {name: getattr(self, f"_{name}") for name in self.ARRAYS}
+
+    def _split_degrees(self):
+        self.degree_rows = {
+            int(degree): rows
+            for degree, rows in zip(self._degrees.tolist(), np.split(self._by_degree, self._degree_starts[1:]))
+        }
+
+    def rows(self, degree_ids):
+        """Sorted catalog rows in any of `degree_ids`; None (every row) when no filter is given"""
+        if not degree_ids:
+            return None
+        found = [self.degree_rows[d] for d in set(degree_ids) if d in self.degree_rows]
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return found[0] if len(found) == 1 else np.sort(np.concatenate(found))
+
+    def id_ranks(self, course_ids):
+        """`rank` of the rows holding each course id"""
+        positions = np.searchsorted(self._sorted_ids, np.asarray(course_ids, dtype=np.int64))
+        return self.rank[self._id_order[positions]]
@@ -0,0 +1,185 @@
+# course_db.py
+"""Shared data access for the ups_courses table.
+
+One lazily created, pooled SQLAlchemy engine serves the API, the course
+monitor and the training scripts. Configuration comes from the environment:
+
+    COURSE_DB_URL            full SQLAlchemy URL (e.g. sqlite:///ups_courses.db); overrides the parts below
+    COURSE_DB_USER           default "root"
+    COURSE_DB_PASSWORD       default "root"
+    COURSE_DB_HOST           default "localhost"
+    COURSE_DB_PORT           default 3306
+    COURSE_DB_NAME           default "resume_analyzer"
+    COURSE_DB_POOL_SIZE      default 5
+    COURSE_DB_MAX_OVERFLOW   default 5
+    COURSE_DB_POOL_RECYCLE   seconds before a connection is replaced, default 1800
+"""
+import os
+import sqlite3
+import threading
+import zlib
+from typing import Any, Iterator, NamedTuple, Optional, Union
+
+import pandas as pd
+from sqlalchemy import create_engine, event, make_url, text
+from sqlalchemy.engine import URL, Engine
+
+TABLE_NAME = "ups_courses"
+COURSE_COL = "course_name"
+# Served with every course for filtering and ordering, see catalog_partitions.py
+METADATA_COLS = ("degree_id", "sequence")
+COURSE_COLUMNS = ", ".join(f"`{column}`" for column in ("id", COURSE_COL, *METADATA_COLS))
+
+_engine: Optional[Engine] = None
+_engine_lock = threading.Lock()
+
+
+class CourseProbe(NamedTuple):
+    last_updated: Any
+    row_count: int
+    max_id: Optional[int]
+
+
+class CourseEdge(NamedTuple):
+    """Row count and id-weighted checksums of the rows stamped exactly at the watermark"""
+    row_count: int
+    id_sum: Optional[int]
+    name_sum: Optional[int]
+    degree_sum: Optional[int]
+    sequence_sum: Optional[int]
+    active_sum: Optional[int]
+
+
+@event.listens_for(Engine, "connect")
+def _add_sqlite_functions(dbapi_connection, connection_record):
+    # SQLite stand-ins have no MySQL CRC32(), used by edge_checksum()
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function(
+            "CRC32", 1, lambda value: None if value is None else zlib.crc32(str(value).encode("utf-8")),
+            deterministic=True
+        )
+
+
+def database_url() -> Union[str, URL]:
+    """COURSE_DB_URL as given, else a URL built from the parts; user and password need no escaping"""
+    url = os.environ.get("COURSE_DB_URL")
+    if url:
+        return url
+    return URL.create(
+        drivername="mysql+pymysql",
+        username=os.environ.get("COURSE_DB_USER", "root"),
+        password=os.environ.get("COURSE_DB_PASSWORD", "root"),
+        host=os.environ.get("COURSE_DB_HOST", "localhost"),
+        port=int(os.environ.get("COURSE_DB_PORT", 3306)),
+        database=os.environ.get("COURSE_DB_NAME", "resume_analyzer"),
+    )
+
+
+def get_engine() -> Engine:
+    """The process-wide pooled engine, created on first use"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                url = make_url(database_url())
+                pool_options = {}
+                # In-memory SQLite keeps one connection per thread and takes no queue pool settings
+                if not (url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")):
+                    pool_options = {
+                        "pool_size": int(os.environ.get("COURSE_DB_POOL_SIZE", 5)),
+                        "max_overflow": int(os.environ.get("COURSE_DB_MAX_OVERFLOW", 5)),
+                        "pool_recycle": int(os.environ.get("COURSE_DB_POOL_RECYCLE", 1800)),
+                    }
+                _engine = create_engine(url, pool_pre_ping=True, **pool_options)
+    return _engine
+
+
+def set_engine(engine: Optional[Engine]) -> None:
+    """Replace the shared engine (e.g. with a SQLite stand-in); None recreates it from the environment"""
+    global _engine
+    with _engine_lock:
+        if _engine is not None and _engine is not engine:
+            _engine.dispose()
+        _engine = engine
+
+
+def dispose_after_fork() -> None:
+    """Drop pooled connections inherited from a parent process without closing the parent's sockets"""
+    if _engine is not None:
+        _engine.dispose(close=False)
+
+
+def clean_courses(df: pd.DataFrame) -> pd.DataFrame:
+    """Drop empty and duplicate course names and strip whitespace, keeping the first id per name"""
+    df = df[df[COURSE_COL].notna()].drop_duplicates(subset=[COURSE_COL]).reset_index(drop=True)
+    df[COURSE_COL] = df[COURSE_COL].astype(str).str.strip()
+    return df
+
+
+def fetch_active_courses(engine: Optional[Engine] = None) -> pd.DataFrame:
+    """Active (id, course_name, degree_id, sequence) rows in id order, before de-duplication"""
+    df = pd.read_sql(
+        f"SELECT {COURSE_COLUMNS} FROM `{TABLE_NAME}` WHERE status = 'Active'",
+        engine or get_engine()
+    )
+    return df.sort_values("id", kind="stable").reset_index(drop=True)
+
+
+def iter_active_courses(chunksize: int, engine: Optional[Engine] = None) -> Iterator[pd.DataFrame]:
+    """fetch_active_courses() rows, `chunksize` at a time.
+
+    Rows are read through a server-side cursor (stream_results), so neither
+    the driver nor pandas ever buffers the whole table.
+    """
+    query = text(f"SELECT {COURSE_COLUMNS} FROM `{TABLE_NAME}` WHERE status = 'Active' ORDER BY `id`")
+    with (engine or get_engine()).connect() as conn:
+        conn = conn.execution_options(stream_results=True, max_row_buffer=chunksize)
+        yield from pd.read_sql(query, conn, chunksize=chunksize)
+
+
+def probe_courses(engine: Optional[Engine] = None) -> CourseProbe:
+    """Constant-cost change probe over the whole table"""
+    row = pd.read_sql(
+        f"SELECT MAX(updated_on) AS last_updated, COUNT(*) AS row_count, MAX(id) AS max_id FROM `{TABLE_NAME}`",
+        engine or get_engine()
+    ).iloc[0]
+    return CourseProbe(
+        last_updated=None if pd.isna(row["last_updated"]) else row["last_updated"],
+        row_count=int(row["row_count"]),
+        max_id=None if pd.isna(row["max_id"]) else int(row["max_id"]),
+    )
+
+
+def edge_checksum(watermark: Any, engine: Optional[Engine] = None) -> CourseEdge:
+    """One-row aggregate over the rows with updated_on equal to `watermark`.
+
+    Each sum weighs a column by the row id, so moving a value from one row
+    to another changes it too; the name enters as CRC32 % 1000003 so the
+    sums stay well inside BIGINT. The updated_on index keeps this
+    proportional to the rows at the watermark, and only the aggregate is
+    sent back.
+    """
+    row = pd.read_sql(
+        text(
+            "SELECT COUNT(*) AS row_count, SUM(`id`) AS id_sum, "
+            f"SUM(`id` * (CRC32(`{COURSE_COL}`) % 1000003)) AS name_sum, "
+            "SUM(`id` * `degree_id`) AS degree_sum, SUM(`id` * `sequence`) AS sequence_sum, "
+            "SUM(CASE WHEN `status` = 'Active' THEN `id` ELSE 0 END) AS active_sum "
+            f"FROM `{TABLE_NAME}` WHERE `updated_on` = :watermark"
+        ),
+        engine or get_engine(),
+        params={"watermark": watermark},
+    ).iloc[0]
+    return CourseEdge(*(None if pd.isna(value) else int(value) for value in row.tolist()))
+
+
+def fetch_course_changes(since: Any, max_id: Optional[int], engine: Optional[Engine] = None) -> pd.DataFrame:
+    """fetch_active_courses() columns plus status of rows updated at or after `since`, or with an id
+    above `max_id`. An index on updated_on keeps this proportional to the rows returned."""
+    query = text(
+        f"SELECT {COURSE_COLUMNS}, `status` FROM `{TABLE_NAME}` "
+        f"WHERE updated_on >= :since OR id > :max_id"
+    )
+    # An empty table has no watermark yet; every row is new
+    params = {"since": since if since is not None else "", "max_id": max_id or 0}
+    return pd.read_sql(query, engine or get_engine(), params=params)
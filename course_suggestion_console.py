@@ -0,0 +1,53 @@
+# course_suggestion_console.py
+"""Interactive Windows console for course suggestions (ESC to exit).
+
+Usage: python course_suggestion_console.py
+"""
+import msvcrt
+
+from course_suggestion_realtime import current_snapshot, fetch_courses_from_db, start_monitor, sync_model
+from suggestion_pipeline import suggest
+
+# Suggestions shown per keystroke
+LIMIT = 8
+
+def realtime_mode():
+    sync_model(fetch_courses_from_db())
+    start_monitor()
+    print("🎓 Real-time Degree Suggestion (ML + MySQL Auto-Update)")
+    print("Start typing (ESC to exit)\n")
+    current_input = ""
+
+    while True:
+        print(f"\rQuery: {current_input}", end="", flush=True)
+
+        if msvcrt.kbhit():
+            key = msvcrt.getch()
+            if key == b'\x1b':
+                break
+            elif key == b'\r':
+                print("\n")
+                continue
+            elif key == b'\x08':
+                if current_input:
+                    current_input = current_input[:-1]
+            elif 32 <= ord(key) <= 126:
+                current_input += key.decode('utf-8')
+
+            print("\033[2J\033[H", end="")
+            print("🎓 Real-time Degree Suggestion (ML + MySQL Auto-Update)")
+            print("Start typing (ESC to exit)\n")
+            print(f"Query: {current_input}")
+
+            if current_input:
+                suggestions, _ = suggest(current_input, current_snapshot(), LIMIT)
+                if suggestions:
+                    print(f"\nSuggestions ({len(suggestions)}):")
+                    for name, course_id, score in suggestions:
+                        print(f"  {name} ({score}%) [ID: {course_id}]")
+                else:
+                    print("\nNo matches found")
+            print("\n" + "-" * 50)
+
+if __name__ == "__main__":
+    realtime_mode()
\ No newline at end of file
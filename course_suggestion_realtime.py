@@ -1,201 +1,339 @@
 # course_suggestion_realtime.py
 import warnings
-import pickle
 import pandas as pd
-import msvcrt
+import sys
 import threading
 import time
-import hashlib
 import subprocess
 from pathlib import Path
-from sqlalchemy import create_engine
+from scipy.sparse import vstack
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+import course_db
+import index_artifact
+from catalog_partitions import METADATA_DEFAULTS, with_metadata
+from course_db import clean_courses
+from index_snapshot import courses_hash
+from suggestion_metrics import MONITOR_ERRORS, record_reload
+from suggestion_pipeline import vectorize_texts
+from text_normalization import normalize_text
 
 # ========== CONFIG ==========
-DB_CONFIG = {
-    "user": "root",
-    "password": "root",
-    "host": "localhost",
-    "port": 3306,
-    "database": "resume_analyzer"
-}
-
+# Database settings come from the environment, see course_db.py
 TABLE_NAME = "ups_courses"
 COURSE_COL = "course_name"
+# How often processes that do not poll the DB check the index manifest for a newer build
 POLL_SECONDS = 5
 
-BASE = Path("ml_suggestion_module")
-CHAR_VEC_FILE = BASE / "char_vectorizer.pkl"
-WORD_VEC_FILE = BASE / "word_vectorizer.pkl"
-MODEL_FILE = BASE / "nn_model.pkl"
+# Memory-mapped index written by retrain_course_model.py, see index_artifact.py
+INDEX_DIR = index_artifact.INDEX_DIR
+RETRAIN_SCRIPT = Path(__file__).resolve().parent / "retrain_course_model.py"
+
+# Added course names whose char/word n-grams are more than this share unseen by
+# the fitted vectorizers trigger a full retrain instead of an incremental update
+DRIFT_THRESHOLD = 0.25
+
+def load_snapshot(manifest=None):
+    """Snapshot of the published on-disk index, or None when none has been written"""
+    return index_artifact.open_snapshot(INDEX_DIR, manifest)
+
+# The published IndexSnapshot. Readers take it once per request and never lock;
+# writers build a complete new snapshot and swap it in with one assignment.
+# Nothing is loaded at import time: the index is opened on first use or by init().
+_snapshot = None
+_publish_lock = threading.RLock()
+# Called with each newly published snapshot, e.g. to drop caches keyed on the old version
+_publish_listeners = []
+
+def current_snapshot():
+    """The published snapshot, opening the on-disk index on first use (None if there is none)"""
+    if _snapshot is None:
+        with _publish_lock:
+            if _snapshot is None:
+                publish_snapshot(load_snapshot())
+    return _snapshot
 
-char_vectorizer = pickle.load(open(CHAR_VEC_FILE, "rb"))
-word_vectorizer = pickle.load(open(WORD_VEC_FILE, "rb"))
-nn = pickle.load(open(MODEL_FILE, "rb"))
+def publish_snapshot(snapshot):
+    global _snapshot
+    _snapshot = snapshot
+    if snapshot is not None:
+        for listener in _publish_listeners:
+            listener(snapshot)
+    return snapshot
 
-def get_courses_hash():
-    engine = create_engine(
-        f"mysql+pymysql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@"
-        f"{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
-    )
-    df = pd.read_sql(f"SELECT `{COURSE_COL}` FROM `{TABLE_NAME}` WHERE status = 'Active'", engine)
-    courses_str = ",".join(sorted(df[COURSE_COL].astype(str).tolist()))
-    return hashlib.md5(courses_str.encode()).hexdigest()
+def add_publish_listener(listener):
+    _publish_listeners.append(listener)
+
+def refresh_snapshot():
+    """Publish the on-disk index if another process wrote a newer build; True if it did"""
+    manifest = index_artifact.read_manifest(INDEX_DIR)
+    if manifest is None:
+        return False
+    with _publish_lock:
+        snapshot = _snapshot
+        if snapshot is not None and snapshot.build == manifest["build"]:
+            return False
+        publish_snapshot(load_snapshot(manifest))
+    print(f"🔄 Swapped in index build {manifest['build']}")
+    return True
+
+def get_courses_hash(engine=None):
+    """Catalog version straight from the DB; matches courses_hash() of fetch_courses_from_db()"""
+    return courses_hash(clean_courses(course_db.fetch_active_courses(engine))[COURSE_COL])
 
 def retrain_and_reload():
-    subprocess.run(["python", "retrain_course_model.py"])
-    global char_vectorizer, word_vectorizer, nn
-    char_vectorizer = pickle.load(open(CHAR_VEC_FILE, "rb"))
-    word_vectorizer = pickle.load(open(WORD_VEC_FILE, "rb"))
-    nn = pickle.load(open(MODEL_FILE, "rb"))
+    """Rebuild the index with retrain_course_model.py and publish it.
+
+    Raises RuntimeError if the retrain fails; whatever snapshot was
+    published before stays in service.
+    """
+    try:
+        subprocess.run([sys.executable, str(RETRAIN_SCRIPT)], check=True)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Retraining failed: retrain_course_model.py exited with status {e.returncode}") from None
+    snapshot = load_snapshot()
+    if snapshot is None:
+        raise RuntimeError(f"Retraining finished but no index was published in {INDEX_DIR}")
+    publish_snapshot(snapshot)
     print("✅ Model reloaded after retraining.")
+    return snapshot
+
+def vocabulary_drift(snapshot, texts):
+    """Share of the char and word n-grams in `texts` that the fitted vectorizers have never seen"""
+    seen = total = 0
+    for vectorizer in (snapshot.char_vectorizer, snapshot.word_vectorizer):
+        analyze = vectorizer.build_analyzer()
+        vocabulary = vectorizer.vocabulary_
+        for text in texts:
+            terms = analyze(text)
+            total += len(terms)
+            seen += sum(term in vocabulary for term in terms)
+    return 1 - seen / total if total else 0.0
+
+def sync_model(courses_df):
+    """Bring the published snapshot in line with `courses_df` and return it.
+
+    Rows are matched on (id, course_name): removed rows are dropped, added rows
+    are transformed against the existing vocabulary and appended; degree_id
+    and sequence always come from `courses_df`, so editing them rewrites the
+    index without touching the matrix. The full retrain subprocess only
+    runs when the artifacts carry no course ids or the added names drift
+    past DRIFT_THRESHOLD; if that retrain fails, the incremental update is
+    applied instead, and with no index at all the RuntimeError from
+    retrain_and_reload() propagates. Writers are serialized; readers
+    keep using the previous snapshot until the new one is published.
+    """
+    with _publish_lock:
+        old = current_snapshot()
+        if old is None:
+            print("🔄 No index found. Retraining model...")
+            return retrain_and_reload()
+
+        old_courses = old.courses
+        old_rows = {key: row for row, key in enumerate(zip(old_courses["id"], old_courses[COURSE_COL]))}
+        new_keys = list(zip(courses_df["id"], courses_df[COURSE_COL]))
+        known = [key in old_rows for key in new_keys]
+        kept = [old_rows[key] for key, is_known in zip(new_keys, known) if is_known]
+        added = courses_df[[not is_known for is_known in known]]
+        # Kept rows first, in the order of their matrix rows below, then the added ones
+        courses = with_metadata(pd.concat([courses_df[known], added], ignore_index=True))
+        metadata = list(METADATA_DEFAULTS)
+        if (added.empty and len(kept) == len(old_courses)
+                and (courses[metadata].to_numpy() == old_courses.iloc[kept][metadata].to_numpy()).all()):
+            return old
+
+        added_texts = [normalize_text(name) for name in added[COURSE_COL]]
+        drift = vocabulary_drift(old, added_texts)
+        if drift > DRIFT_THRESHOLD:
+            print(f"🔄 Vocabulary drift {drift:.1%} exceeds {DRIFT_THRESHOLD:.0%}. Retraining model...")
+            try:
+                return retrain_and_reload()
+            except RuntimeError as e:
+                # The old vocabulary still covers the change; a retrain can catch up with the next one
+                print(f"⚠️ {e}. Updating incrementally instead.")
+
+        matrix = old.engine.matrix[kept]
+        if added_texts:
+            matrix = vstack([matrix, vectorize_texts(old, added_texts)]).tocsr()
+        index_artifact.write_index(old.char_vectorizer, old.word_vectorizer, matrix, courses, INDEX_DIR)
+        snapshot = publish_snapshot(load_snapshot())
+        print(f"✅ Model updated incrementally: +{len(added)} / -{len(old_courses) - len(kept)} courses "
+              f"(vocabulary drift {drift:.1%}).")
+        return snapshot
+
+class CourseChangeTracker:
+    """Detect course table changes with a constant-cost probe instead of hashing every row.
+
+    Each poll runs `MAX(updated_on), COUNT(*), MAX(id)` over the table and
+    course_db.edge_checksum() over the rows stamped exactly at the
+    watermark. An edit stamped in the same second as the watermark leaves
+    the probe unchanged but not that checksum. Both come back as one row
+    each, however many rows share the stamp (after a bulk load, all of
+    them). Only when either differs are the rows updated at or after the
+    watermark (or with new ids) fetched and applied to the in-memory copy of
+    the active rows. If the row count does not add up afterwards (hard
+    deletes), it falls back to a full fetch.
+    """
+
+    def __init__(self, engine=None):
+        self.engine = engine
+        self.probe = None
+        self.edge = None  # course_db.edge_checksum() at the probe's watermark
+        self.active = None  # active fetch_active_courses() rows, before de-duplication
+
+    def load(self):
+        """Full fetch that (re)sets the watermark; returns the catalog like fetch_courses_from_db()"""
+        self.probe = course_db.probe_courses(self.engine)
+        # Read before the rows: an edit in between shows up as a changed edge on the next poll
+        self.edge = course_db.edge_checksum(self.probe.last_updated, self.engine)
+        self.active = course_db.fetch_active_courses(self.engine)
+        return self.catalog()
 
-def monitor_courses(interval=300):
-    last_hash = get_courses_hash()
+    def poll(self):
+        """Return the new catalog if the table changed since the last poll, else None"""
+        if self.probe is None:
+            return self.load()
+        last_updated, row_count, max_id = self.probe
+        probe = course_db.probe_courses(self.engine)
+        edge = course_db.edge_checksum(last_updated, self.engine)
+        if probe == self.probe and edge == self.edge:
+            return None
+
+        if probe.last_updated != last_updated:
+            # The new watermark's edge, read before the rows like in load()
+            edge = course_db.edge_checksum(probe.last_updated, self.engine)
+        delta = course_db.fetch_course_changes(last_updated, max_id, self.engine)
+        inserted = int((delta["id"] > (max_id or 0)).sum())
+        if probe.row_count != row_count + inserted:
+            print("🔄 Course rows were deleted. Reloading all courses...")
+            return self.load()
+
+        unchanged = self.active[~self.active["id"].isin(delta["id"])]
+        now_active = delta[delta["status"] == "Active"].drop(columns=["status"])
+        self.active = pd.concat([unchanged, now_active], ignore_index=True).sort_values("id", kind="stable")
+        self.probe = probe
+        self.edge = edge
+        print(f"🔄 {len(delta)} course rows changed since {last_updated}")
+        return self.catalog()
+
+    def catalog(self):
+        return clean_courses(self.active)
+
+def monitor_courses(interval=300, on_change=None, tracker=None):
+    """Poll the course table and publish an updated snapshot when it changes.
+
+    `on_change(snapshot)` is called after the new snapshot is published.
+    This process holds the host monitor lock for as long as it runs, so a
+    failed poll or update (a DB blip, a failed index write) is logged and
+    retried on the next tick instead of ending the thread.
+    """
+    tracker = tracker or CourseChangeTracker()
+    try:
+        tracker.load()
+    except Exception as e:
+        monitor_failed(tracker, e, interval)
     while True:
         time.sleep(interval)
-        current_hash = get_courses_hash()
-        if current_hash != last_hash:
-            print("🔄 Course table changed. Retraining model...")
-            retrain_and_reload()
-            last_hash = current_hash
-
-threading.Thread(target=monitor_courses, daemon=True).start()
-
-def fetch_courses_from_db():
-    engine = create_engine(
-        f"mysql+pymysql://{DB_CONFIG['user']}:{DB_CONFIG['password']}@"
-        f"{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
-    )
-    query = f"SELECT `id`, `{COURSE_COL}` FROM `{TABLE_NAME}` WHERE status = 'Active'"
-    df = pd.read_sql(query, engine)
-    df = df[df[COURSE_COL].notna()].drop_duplicates(subset=[COURSE_COL]).reset_index(drop=True)
-    df[COURSE_COL] = df[COURSE_COL].astype(str).str.strip()
+        try:
+            courses = tracker.poll()
+            if courses is not None:
+                print("🔄 Course table changed. Updating model...")
+                start_time = time.perf_counter()
+                snapshot = sync_model(courses)
+                record_reload("monitor", time.perf_counter() - start_time)
+                if on_change is not None:
+                    on_change(snapshot)
+        except Exception as e:
+            monitor_failed(tracker, e, interval)
+
+def monitor_failed(tracker, error, interval):
+    MONITOR_ERRORS.inc("monitor")
+    print(f"⚠️ Course monitor failed, retrying in {interval}s: {error}")
+    # The tracker may count the failed change as applied; the next poll starts over with a full fetch
+    tracker.probe = None
+
+def fetch_courses_from_db(engine=None):
+    df = clean_courses(course_db.fetch_active_courses(engine))
     print(f"Loaded {len(df)} active courses from database")
     return df
 
-def get_suggestions(query, courses_df, top_k=8):
-    if not query.strip():
-        return []
-
-    max_neighbors = min(top_k * 2, len(courses_df))
-    if max_neighbors == 0:
-        return []
+# One monitor per process, and per host where fcntl locks are available
+_monitor_lock = threading.Lock()
+_monitor_thread = None
+_monitor_lock_file = None
 
+def _acquire_host_monitor_lock():
+    """Take the host-wide monitor lock file; False if another process holds it"""
+    global _monitor_lock_file
+    if _monitor_lock_file is not None:
+        return True
+    if fcntl is None:
+        return True  # Windows: one monitor per process
+    INDEX_DIR.mkdir(parents=True, exist_ok=True)
+    lock_file = open(INDEX_DIR / "monitor.lock", "w")
     try:
-        def normalize_text(text):
-            import re
-            text = re.sub(r'[^a-zA-Z0-9\s]', '', str(text).lower().strip())
-            return " ".join(text.split())
-
-        query_normalized = normalize_text(query)
-        query_no_dots = query_normalized.replace('.', '')
-
-        from scipy.sparse import hstack
-        X_query_char = char_vectorizer.transform([query_normalized])
-        X_query_word = word_vectorizer.transform([query_normalized])
-        X_query = hstack([X_query_char, X_query_word])
-
-        distances, indices = nn.kneighbors(X_query, n_neighbors=max_neighbors)
-        suggestions = []
-
-        for dist, idx in zip(distances[0], indices[0]):
-            if idx < len(courses_df):
-                course_name = courses_df.iloc[idx][COURSE_COL]
-                course_id = int(courses_df.iloc[idx]['id'])
-                ml_score = max(0, int((1 - dist) * 100))
-
-                query_lower = query.lower().strip()
-                query_clean = query_no_dots
-                course_lower = course_name.lower().strip()
-                course_clean = normalize_text(course_name)
-                course_no_dots = course_clean.replace('.', '')
-
-                boost = 0
-                if query_clean == course_clean:
-                    boost = 100  # Exact match
-                elif course_lower.startswith(query_lower) or course_no_dots.startswith(query_clean):
-                    boost = 90  # Prefix match
-                elif any(word.startswith(query_clean) or word.startswith(query_no_dots) for word in course_clean.split()):
-                    boost = 70  # Word start match
-                elif query_clean in course_clean or query_no_dots in course_no_dots:
-                    boost = 30  # Substring match
-
-                final_score = min(100, ml_score + boost)
-
-                is_relevant = False
-                # For queries >= 3 chars (like "diploma"), require a text-based match
-                if len(query_clean) >= 3:
-                    if boost > 0:  # Must have prefix, word-start, or substring match
-                        is_relevant = True
-                else:
-                    # For shorter queries, allow high ML scores or text matches
-                    if boost > 0 or ml_score >= 70:
-                        is_relevant = True
-
-                # Additional check for longer queries to ensure relevance
-                if is_relevant and len(query_clean) >= 3:
-                    has_connection = (
-                        query_clean in course_clean or
-                        query_no_dots in course_no_dots or
-                        any(word.startswith(query_clean) or word.startswith(query_no_dots) for word in course_clean.split()) or
-                        query_clean == course_clean  # Exact match
-                    )
-                    # Special case for short abbreviations (e.g., "bttm")
-                    if not has_connection and len(query_clean) <= 5:
-                        if ml_score >= 80:  # Higher threshold for ML-only matches
-                            has_connection = True
-                    if not has_connection:
-                        is_relevant = False
-
-                # Only include if relevant and score is above threshold
-                if is_relevant and final_score >= 40:
-                    suggestions.append((course_name, course_id, final_score))
-            else:
-                continue
-
-        suggestions.sort(key=lambda x: (-x[2], x[0]))
-        return suggestions[:top_k]
-        
-    except Exception as e:
-        print(f"Error in suggestions: {e}")
-        return []
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    # Held until the process exits; the OS releases it even on a crash
+    _monitor_lock_file = lock_file
+    return True
 
-def realtime_mode():
-    courses_df = fetch_courses_from_db()
-    print("🎓 Real-time Degree Suggestion (ML + MySQL Auto-Update)")
-    print("Start typing (ESC to exit)\n")
-    current_input = ""
+def follow_index(interval=300):
+    """Swap in builds written by the host's monitor process; take over polling if it goes away.
 
+    Once this process holds the monitor lock it keeps following the
+    manifest until the catch-up sync succeeds, then becomes the monitor.
+    """
+    taking_over = False
     while True:
-        print(f"\rQuery: {current_input}", end="", flush=True)
-
-        if msvcrt.kbhit():
-            key = msvcrt.getch()
-            if key == b'\x1b':
-                break
-            elif key == b'\r':
-                print("\n")
+        time.sleep(POLL_SECONDS)
+        try:
+            start_time = time.perf_counter()
+            if refresh_snapshot():
+                record_reload("follower", time.perf_counter() - start_time)
+        except Exception as e:
+            print(f"⚠️ Could not swap in the new index: {e}")
+        if _acquire_host_monitor_lock():
+            if not taking_over:
+                print("🔄 Course monitor process is gone. Taking over polling...")
+                taking_over = True
+            try:
+                # Catch up on changes made since the previous monitor's last update
+                sync_model(fetch_courses_from_db())
+            except Exception as e:
+                MONITOR_ERRORS.inc("takeover")
+                print(f"⚠️ Could not take over the course monitor, retrying in {POLL_SECONDS}s: {e}")
                 continue
-            elif key == b'\x08':
-                if current_input:
-                    current_input = current_input[:-1]
-            elif 32 <= ord(key) <= 126:
-                current_input += key.decode('utf-8')
-
-            print("\033[2J\033[H", end="")
-            print("🎓 Real-time Degree Suggestion (ML + MySQL Auto-Update)")
-            print("Start typing (ESC to exit)\n")
-            print(f"Query: {current_input}")
-
-            if current_input:
-                suggestions = get_suggestions(current_input, courses_df)
-                if suggestions:
-                    print(f"\nSuggestions ({len(suggestions)}):")
-                    for name, course_id, score in suggestions:
-                        print(f"  {name} ({score}%) [ID: {course_id}]")
-                else:
-                    print("\nNo matches found")
-            print("\n" + "-" * 50)
-
-if __name__ == "__main__":
-    realtime_mode()
\ No newline at end of file
+            return monitor_courses(interval)
+
+def start_monitor(interval=300):
+    """Start this process's background index thread; safe to call repeatedly.
+
+    The first process on the host to get here polls the database (monitor);
+    every other process follows the index manifest and swaps in each build
+    the monitor writes, so the DB is polled once per host. Returns True when
+    this process is the monitor. Subscribe to new snapshots with
+    add_publish_listener().
+    """
+    global _monitor_thread
+    with _monitor_lock:
+        if _monitor_thread is None:
+            if _acquire_host_monitor_lock():
+                target, name = monitor_courses, "course-monitor"
+            else:
+                print("ℹ️ Course monitor runs in another process on this host; following its index")
+                target, name = follow_index, "index-follower"
+            _monitor_thread = threading.Thread(target=target, args=(interval,), name=name, daemon=True)
+            _monitor_thread.start()
+        return _monitor_lock_file is not None or fcntl is None
+
+def init(monitor=True, interval=300):
+    """Open the published index and optionally start the course monitor; safe to call repeatedly"""
+    snapshot = current_snapshot()
+    if monitor:
+        start_monitor(interval)
+    return snapshot
@@ -0,0 +1,35 @@
+# gunicorn.conf.py
+"""Production server settings: gunicorn -c gunicorn.conf.py
+
+Environment overrides:
+
+    COURSE_API_BIND      default "0.0.0.0:5002"
+    COURSE_API_WORKERS   default one per CPU core
+    COURSE_API_THREADS   threads per worker, default 1
+    COURSE_API_TIMEOUT   seconds, default 30
+
+The app is preloaded in the master (see wsgi.py) so every worker shares the
+memory-mapped index. After the fork one worker takes the host monitor lock
+and polls the database; the others watch the index manifest and swap in
+each build it writes (course_suggestion_realtime.start_monitor).
+"""
+import multiprocessing
+import os
+
+wsgi_app = "wsgi:app"
+bind = os.environ.get("COURSE_API_BIND", "0.0.0.0:5002")
+workers = int(os.environ.get("COURSE_API_WORKERS", multiprocessing.cpu_count()))
+threads = int(os.environ.get("COURSE_API_THREADS", 1))
+timeout = int(os.environ.get("COURSE_API_TIMEOUT", 30))
+preload_app = True
+
+
+def post_fork(server, worker):
+    import course_db
+    from course_suggestion_realtime import refresh_snapshot, start_monitor
+
+    # Pooled DB connections opened while preloading belong to the master
+    course_db.dispose_after_fork()
+    # A worker forked after a reload (e.g. a replacement for a dead one) starts from the newest build
+    refresh_snapshot()
+    start_monitor(300)
@@ -0,0 +1,421 @@
+# index_artifact.py
+"""Versioned on-disk index format, opened with memory maps instead of pickle.
+
+Layout under INDEX_DIR:
+
+    manifest.json              {"format_version", "build", "version", ...}; replaced atomically
+    <build>/char_terms.npy     UTF-8 bytes of the char vocabulary, in feature order
+    <build>/char_term_offsets.npy
+    <build>/char_idf.npy
+    <build>/word_terms.npy     same for the word vocabulary
+    <build>/word_term_offsets.npy
+    <build>/word_idf.npy
+    <build>/matrix_data.npy    L2-normalized combined TF-IDF matrix, CSR
+    <build>/matrix_indices.npy
+    <build>/matrix_indptr.npy
+    <build>/matrix_t_data.npy  its transpose, CSR, so queries need no conversion
+    <build>/matrix_t_indices.npy
+    <build>/matrix_t_indptr.npy
+    <build>/course_ids.npy
+    <build>/course_names.npy   UTF-8 bytes of the names, in matrix row order
+    <build>/course_name_offsets.npy
+    <build>/course_degree_id.npy  per-row metadata (catalog_partitions.METADATA_DEFAULTS);
+    <build>/course_sequence.npy   builds written before it was stored read as the defaults
+    <build>/course_norm_texts.npy prepare_courses() text columns (index_snapshot.PREPARED_COLUMNS),
+    <build>/course_norm_text_offsets.npy  stored like the names
+    <build>/<field>_<array>.npy   arrays() of each derive_indexes() index, e.g.
+                                  rule_index_full_keys.npy, fuzzy_index_postings.npy, partitions_rank.npy;
+                                  builds written before they were stored derive them when opened
+    <build>/hot_set.json       precomputed results of the hot queries (suggestion_hot_set.py)
+
+Every array is a plain .npy file opened with mmap_mode="r", so worker
+processes share the page cache instead of holding private copies, and no
+file is ever unpickled. The prefix, n-gram and partition indexes are
+computed once when a build is written, not in every process that opens
+it, and so is the hot set. Each write goes to a fresh build directory and is published by
+replacing manifest.json, so readers never see a half-written index;
+`version` is the catalog hash of the build.
+"""
+import dataclasses
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+from catalog_partitions import METADATA_DEFAULTS, CatalogPartitions, with_metadata
+from index_snapshot import PREPARED_COLUMNS, build_snapshot, courses_hash, derive_indexes, prepare_courses
+from prefix_index import PrefixIndex
+from similarity_engine import SimilarityEngine, l2_normalize_rows
+from suggestion_hot_set import HOT_SET_FILE, build_hot_set, load_hot_set, save_hot_set
+from trigram_index import TrigramIndex
+
+FORMAT_VERSION = 1
+INDEX_DIR = Path(os.environ.get("COURSE_INDEX_DIR", Path("ml_suggestion_module") / "index"))
+MANIFEST_FILE = "manifest.json"
+COURSE_COL = "course_name"
+
+# Builds kept on disk: the current one plus the previous, which other processes may still have mapped
+KEEP_BUILDS = 2
+# Transpose non-zeros assembled at once by IndexWriter (~100 MB of data, row ids and column ids)
+TRANSPOSE_BLOCK_NNZ = 1 << 22
+
+# Class of each derive_indexes() index, by snapshot field
+DERIVED_INDEXES = {"ml_prefix_index": PrefixIndex, "rule_index": PrefixIndex, "fuzzy_index": TrigramIndex,
+                   "partitions": CatalogPartitions}
+
+# TfidfVectorizer parameters that affect transform(); fit-only ones (min_df, max_features...) are not stored
+VECTORIZER_PARAMS = ("analyzer", "binary", "lowercase", "ngram_range", "norm", "smooth_idf",
+                     "stop_words", "strip_accents", "sublinear_tf", "token_pattern", "use_idf")
+
+
+def _save(build_dir, name, array):
+    np.save(build_dir / f"{name}.npy", np.ascontiguousarray(array), allow_pickle=False)
+
+
+def _load(build_dir, name):
+    return np.load(build_dir / f"{name}.npy", mmap_mode="r", allow_pickle=False)
+
+
+def _save_strings(build_dir, name, strings):
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    _save(build_dir, name, np.frombuffer(b"".join(encoded), dtype=np.uint8))
+    _save(build_dir, f"{name[:-1]}_offsets", offsets)
+
+
+def _load_strings(build_dir, name):
+    blob = _load(build_dir, name).tobytes()
+    offsets = _load(build_dir, f"{name[:-1]}_offsets").tolist()
+    return [blob[start:end].decode("utf-8") for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def _save_csr(build_dir, name, matrix):
+    _save(build_dir, f"{name}_data", matrix.data)
+    _save(build_dir, f"{name}_indices", matrix.indices)
+    _save(build_dir, f"{name}_indptr", matrix.indptr)
+
+
+def _load_csr(build_dir, name, shape):
+    arrays = (_load(build_dir, f"{name}_data"), _load(build_dir, f"{name}_indices"), _load(build_dir, f"{name}_indptr"))
+    return csr_matrix(arrays, shape=shape, copy=False)
+
+
+def _save_metadata(build_dir, metadata):
+    """Per-row metadata arrays, {column: values} for every METADATA_DEFAULTS column"""
+    for column in METADATA_DEFAULTS:
+        _save(build_dir, f"course_{column}", np.asarray(metadata[column], dtype=np.int64))
+
+
+def _load_metadata(build_dir, n_courses):
+    metadata = {}
+    for column, default in METADATA_DEFAULTS.items():
+        if (build_dir / f"course_{column}.npy").exists():
+            metadata[column] = _load(build_dir, f"course_{column}")
+        else:
+            metadata[column] = np.full(n_courses, default, dtype=np.int64)
+    return metadata
+
+
+def _save_derived(build_dir, ids, names, metadata):
+    """prepare_courses() columns and derive_indexes() arrays of the catalog as open_index() reads it back"""
+    courses = prepare_courses(pd.DataFrame({
+        "id": np.asarray(ids, dtype=np.int64),
+        COURSE_COL: names,
+        **{column: np.asarray(metadata[column], dtype=np.int64) for column in METADATA_DEFAULTS},
+    }))
+    for column in PREPARED_COLUMNS:
+        _save_strings(build_dir, f"{column}_texts", courses[column].tolist())
+    for field, index in derive_indexes(courses).items():
+        for name, array in index.arrays().items():
+            _save(build_dir, f"{field}_{name}", array)
+
+
+def _load_derived(build_dir, courses):
+    """(prepared courses, indexes) saved by _save_derived(), or (courses, None) for an older build"""
+    if not (build_dir / "partitions_rank.npy").exists():
+        return courses, None
+    courses = courses.assign(**{column: _load_strings(build_dir, f"{column}_texts") for column in PREPARED_COLUMNS})
+    indexes = {}
+    for field, index_class in DERIVED_INDEXES.items():
+        arrays = {name: _load(build_dir, f"{field}_{name}") for name in index_class.ARRAYS}
+        if index_class is TrigramIndex:
+            indexes[field] = index_class.from_arrays(arrays, courses[COURSE_COL].tolist())
+        else:
+            indexes[field] = index_class.from_arrays(arrays)
+    return courses, indexes
+
+
+def _vectorizer_params(vectorizer):
+    params = vectorizer.get_params()
+    if callable(params["analyzer"]) or params["tokenizer"] is not None or params["preprocessor"] is not None:
+        raise ValueError("Vectorizers with custom callables cannot be stored in the index format")
+    return {name: params[name] for name in VECTORIZER_PARAMS}
+
+
+def _save_vectorizer(build_dir, name, vectorizer):
+    # Also works for a vocabulary passed in rather than fitted
+    terms = vectorizer.get_feature_names_out().tolist()
+    _save_strings(build_dir, f"{name}_terms", terms)
+    _save(build_dir, f"{name}_idf", vectorizer.idf_)
+
+
+def _load_vectorizer(build_dir, name, params):
+    # sklearn alone is most of the API's import time, so it is only imported when an index is opened
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    params = dict(params, ngram_range=tuple(params["ngram_range"]))
+    terms = _load_strings(build_dir, f"{name}_terms")
+    vectorizer = TfidfVectorizer(vocabulary={term: i for i, term in enumerate(terms)}, **params)
+    vectorizer.idf_ = np.asarray(_load(build_dir, f"{name}_idf"))
+    return vectorizer
+
+
+def read_manifest(index_dir=INDEX_DIR):
+    """The published manifest, or None when no index has been written"""
+    try:
+        with open(Path(index_dir) / MANIFEST_FILE, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Index format {manifest.get('format_version')} is not supported (expected {FORMAT_VERSION})")
+    return manifest
+
+
+def _new_build(index_dir, names):
+    """(build, version, build_dir) for a new build of the catalog `names`"""
+    version = courses_hash(names)
+    build = f"{time.strftime('%Y%m%d%H%M%S')}-{time.time_ns() % 10**9:09d}-{version[:8]}"
+    build_dir = Path(index_dir) / build
+    build_dir.mkdir(parents=True)
+    return build, version, build_dir
+
+
+def _publish(index_dir, build, version, shape, char_vectorizer, word_vectorizer):
+    """Point manifest.json at a complete build and prune old builds"""
+    index_dir = Path(index_dir)
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "build": build,
+        "version": version,
+        "n_courses": shape[0],
+        "n_features": shape[1],
+        "char_vectorizer": _vectorizer_params(char_vectorizer),
+        "word_vectorizer": _vectorizer_params(word_vectorizer),
+    }
+    # Scored from the finished build, so it matches what open_snapshot() returns
+    save_hot_set(build_hot_set(open_snapshot(index_dir, manifest)), index_dir / build / HOT_SET_FILE)
+    tmp = index_dir / f"{MANIFEST_FILE}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, index_dir / MANIFEST_FILE)
+    prune_builds(index_dir, keep=build)
+    return manifest
+
+
+def write_index(char_vectorizer, word_vectorizer, matrix, courses, index_dir=INDEX_DIR):
+    """Write a new build for `courses` (in `matrix` row order) and publish its manifest"""
+    if len(courses) != matrix.shape[0]:
+        raise ValueError(f"{len(courses)} courses for a {matrix.shape[0]}-row matrix")
+    names = courses[COURSE_COL].astype(str).tolist()
+    build, version, build_dir = _new_build(index_dir, names)
+
+    matrix = l2_normalize_rows(matrix)
+    matrix.sort_indices()
+    _save_vectorizer(build_dir, "char", char_vectorizer)
+    _save_vectorizer(build_dir, "word", word_vectorizer)
+    _save_csr(build_dir, "matrix", matrix)
+    _save_csr(build_dir, "matrix_t", matrix.T.tocsr())
+    _save(build_dir, "course_ids", courses["id"].to_numpy(dtype=np.int64))
+    _save_strings(build_dir, "course_names", names)
+    metadata = with_metadata(courses)
+    _save_metadata(build_dir, metadata)
+    _save_derived(build_dir, courses["id"], names, metadata)
+    return _publish(index_dir, build, version, matrix.shape, char_vectorizer, word_vectorizer)
+
+
+class _ArrayFile:
+    """A 1-D .npy file of known length written front to back, so nothing stays mapped or resident"""
+
+    def __init__(self, path, dtype, length):
+        self.length = length
+        self.written = 0
+        self._file = open(path, "wb")
+        header = {"descr": np.lib.format.dtype_to_descr(np.dtype(dtype)), "fortran_order": False,
+                  "shape": (length,)}
+        np.lib.format.write_array_header_2_0(self._file, header)
+        self._dtype = np.dtype(dtype)
+
+    def append(self, values):
+        values = np.ascontiguousarray(values, dtype=self._dtype)
+        self._file.write(values.tobytes())
+        self.written += len(values)
+
+    def close(self):
+        self._file.close()
+        if self.written != self.length:
+            raise ValueError(f"{self._file.name}: {self.written} of {self.length} values written")
+
+
+class IndexWriter:
+    """Write one build chunk by chunk, without the whole matrix in memory.
+
+    Sizes are known up front (the number of rows, and the non-zeros per
+    column, which are the document frequencies). add_rows() appends each
+    L2-normalized CSR chunk to the matrix files and spills its columns
+    (CSC) next to them; publish() assembles the transpose from the spills
+    TRANSPOSE_BLOCK_NNZ non-zeros at a time and writes the manifest.
+    `char_vectorizer` and `word_vectorizer` need their vocabulary and idf_
+    set; `metadata` maps METADATA_DEFAULTS columns to per-row values
+    (defaults when omitted).
+    """
+
+    def __init__(self, ids, names, char_vectorizer, word_vectorizer, column_nnz, index_dir=INDEX_DIR,
+                 metadata=None):
+        self.index_dir = Path(index_dir)
+        self.char_vectorizer, self.word_vectorizer = char_vectorizer, word_vectorizer
+        self.shape = (len(names), len(column_nnz))
+        self.build, self.version, self._build_dir = _new_build(index_dir, names)
+
+        _save_vectorizer(self._build_dir, "char", char_vectorizer)
+        _save_vectorizer(self._build_dir, "word", word_vectorizer)
+        _save(self._build_dir, "course_ids", np.asarray(ids, dtype=np.int64))
+        _save_strings(self._build_dir, "course_names", names)
+        metadata = {
+            column: (metadata or {}).get(column, np.full(len(names), default, dtype=np.int64))
+            for column, default in METADATA_DEFAULTS.items()
+        }
+        _save_metadata(self._build_dir, metadata)
+        _save_derived(self._build_dir, ids, names, metadata)
+
+        nnz = int(np.sum(column_nnz))
+        # Same index dtype scipy picks for a matrix this size
+        self._index_dtype = np.int32 if max(nnz, *self.shape) < 2**31 else np.int64
+        self._t_indptr = np.zeros(self.shape[1] + 1, dtype=self._index_dtype)
+        np.cumsum(column_nnz, out=self._t_indptr[1:])
+
+        self._data = _ArrayFile(self._build_dir / "matrix_data.npy", np.float64, nnz)
+        self._indices = _ArrayFile(self._build_dir / "matrix_indices.npy", self._index_dtype, nnz)
+        self._indptr = _ArrayFile(self._build_dir / "matrix_indptr.npy", self._index_dtype, self.shape[0] + 1)
+        self._indptr.append([0])
+        self._spill_dir = self._build_dir / "transpose_spill"
+        self._spill_dir.mkdir()
+        self._chunks = 0
+        self._rows = 0
+
+    def add_rows(self, chunk):
+        """Append the next rows, an L2-normalized CSR chunk with the full column count"""
+        chunk = csr_matrix(chunk)
+        # Canonical column order within rows, as write_index() stores it
+        chunk.sort_indices()
+        self._data.append(chunk.data)
+        self._indices.append(chunk.indices)
+        self._indptr.append(chunk.indptr[1:].astype(np.int64) + self._data.written - chunk.nnz)
+
+        by_column = chunk.tocsc()
+        by_column.sort_indices()
+        _save(self._spill_dir, f"{self._chunks}_data", by_column.data)
+        _save(self._spill_dir, f"{self._chunks}_rows", by_column.indices.astype(np.int64) + self._rows)
+        _save(self._spill_dir, f"{self._chunks}_indptr", by_column.indptr.astype(np.int64))
+        self._chunks += 1
+        self._rows += chunk.shape[0]
+
+    def _write_transpose(self):
+        """Matrix columns as transpose rows, merged from the chunk spills one block of columns at a time"""
+        t_data = _ArrayFile(self._build_dir / "matrix_t_data.npy", np.float64, int(self._t_indptr[-1]))
+        t_indices = _ArrayFile(self._build_dir / "matrix_t_indices.npy", self._index_dtype, int(self._t_indptr[-1]))
+        bounds = np.unique(np.concatenate([
+            np.searchsorted(self._t_indptr, np.arange(0, self._t_indptr[-1], TRANSPOSE_BLOCK_NNZ), side="right") - 1,
+            [self.shape[1]],
+        ]))
+        for first, last in zip(bounds[:-1], bounds[1:]):
+            columns, data, rows = [], [], []
+            for chunk in range(self._chunks):
+                indptr = _load(self._spill_dir, f"{chunk}_indptr")
+                start, stop = int(indptr[first]), int(indptr[last])
+                counts = np.diff(indptr[first:last + 1])
+                columns.append(np.repeat(np.arange(first, last), counts))
+                data.append(np.array(_load(self._spill_dir, f"{chunk}_data")[start:stop]))
+                rows.append(np.array(_load(self._spill_dir, f"{chunk}_rows")[start:stop]))
+            # Chunks hold increasing rows, so a stable sort on the column keeps each transpose row sorted
+            order = np.argsort(np.concatenate(columns), kind="stable")
+            t_data.append(np.concatenate(data)[order])
+            t_indices.append(np.concatenate(rows)[order])
+        t_data.close()
+        t_indices.close()
+        _save(self._build_dir, "matrix_t_indptr", self._t_indptr)
+
+    def publish(self):
+        """Finish the files and publish the build; returns the manifest"""
+        if self._rows != self.shape[0]:
+            raise ValueError(f"{self._rows} of {self.shape[0]} rows written")
+        for array in (self._data, self._indices, self._indptr):
+            array.close()
+        self._write_transpose()
+        shutil.rmtree(self._spill_dir)
+        return _publish(self.index_dir, self.build, self.version, self.shape,
+                        self.char_vectorizer, self.word_vectorizer)
+
+
+def prune_builds(index_dir=INDEX_DIR, keep=None):
+    """Delete all but the newest KEEP_BUILDS build directories (never `keep`)"""
+    # Build names start with their timestamp; other directories (e.g. index_builder spills) are not builds
+    builds = sorted((p for p in Path(index_dir).iterdir() if p.is_dir() and p.name[:1].isdigit()),
+                    key=lambda p: p.name, reverse=True)
+    for path in builds[KEEP_BUILDS:]:
+        if path.name != keep:
+            # Mapped files may be locked on Windows; the next write retries
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def open_index(index_dir=INDEX_DIR, manifest=None):
+    """(char_vectorizer, word_vectorizer, engine, courses, manifest) of the published build, or None.
+
+    Matrix and course ids stay memory-mapped; only the vocabularies and
+    names are decoded into the process.
+    """
+    manifest = manifest or read_manifest(index_dir)
+    if manifest is None:
+        return None
+    build_dir = Path(index_dir) / manifest["build"]
+    shape = (manifest["n_courses"], manifest["n_features"])
+    engine = SimilarityEngine(
+        _load_csr(build_dir, "matrix", shape),
+        matrix_t=_load_csr(build_dir, "matrix_t", shape[::-1])
+    )
+    courses = pd.DataFrame({
+        "id": _load(build_dir, "course_ids"),
+        COURSE_COL: _load_strings(build_dir, "course_names"),
+        **_load_metadata(build_dir, shape[0]),
+    })
+    return (
+        _load_vectorizer(build_dir, "char", manifest["char_vectorizer"]),
+        _load_vectorizer(build_dir, "word", manifest["word_vectorizer"]),
+        engine,
+        courses,
+        manifest,
+    )
+
+
+def open_snapshot(index_dir=INDEX_DIR, manifest=None):
+    """index_snapshot.IndexSnapshot of the published build, or None.
+
+    Like open_index(), with the prepared text columns decoded, the derived
+    indexes memory-mapped from the build and its stored hot set.
+    """
+    opened = open_index(index_dir, manifest)
+    if opened is None:
+        return None
+    char_vectorizer, word_vectorizer, engine, courses, manifest = opened
+    build_dir = Path(index_dir) / manifest["build"]
+    courses, indexes = _load_derived(build_dir, courses)
+    snapshot = build_snapshot(char_vectorizer, word_vectorizer, engine, courses,
+                              version=manifest["version"], build=manifest["build"], indexes=indexes)
+    hot_set = load_hot_set(build_dir / HOT_SET_FILE, snapshot.layout_version)
+    return snapshot if hot_set is None else dataclasses.replace(snapshot, hot_set=hot_set)
@@ -0,0 +1,203 @@
+# index_builder.py
+"""Streaming, chunked index build for large catalogs.
+
+Writes the same build as fit_model() + write_index() (same vocabularies,
+IDF weights and matrix) without ever holding the whole TF-IDF matrix:
+
+1. Rows arrive in chunks (e.g. from course_db.iter_active_courses()) and
+   are de-duplicated like clean_courses(). Worker processes normalize and
+   count the n-grams of each chunk, spill the counts to disk and return
+   only the chunk's terms and document frequencies.
+2. The merged frequencies fix the vocabularies, the IDF weights and the
+   size of every array. Workers turn each spilled chunk into L2-normalized
+   TF-IDF rows (a column remap, no second analysis) and the parent appends
+   them to an index_artifact.IndexWriter.
+
+The parent holds the ids, the names, the per-row metadata, the
+vocabularies and at most WORKERS * 2 chunks in flight.
+"""
+import os
+import sys
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from scipy.sparse import csr_matrix, hstack
+
+from catalog_partitions import METADATA_DEFAULTS, with_metadata
+from index_artifact import INDEX_DIR, IndexWriter
+from similarity_engine import l2_normalize_rows
+from suggestion_pipeline import CHAR_VECTORIZER_PARAMS, WORD_VECTORIZER_PARAMS, make_vectorizers
+from text_normalization import normalize_text
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# ========== CONFIG ==========
+COURSE_COL = "course_name"
+# Rows per chunk read from the DB, and per unit of work in the pool
+CHUNK_ROWS = int(os.environ.get("COURSE_TRAIN_CHUNK_ROWS", 50000))
+# Worker processes; 1 runs everything in the calling process
+WORKERS = int(os.environ.get("COURSE_TRAIN_WORKERS", os.cpu_count() or 1))
+
+# Per-process pass 2 state, set by _init_worker
+_vocabularies = None
+_idfs = None
+
+
+def _init_worker(vocabularies=None, idfs=None):
+    global _vocabularies, _idfs
+    _vocabularies, _idfs = vocabularies, idfs
+
+
+def _count_chunk(job):
+    """Pass 1: term counts of one chunk, spilled to disk; returns each analyzer's terms and document frequencies"""
+    spill_dir, chunk_no, names = job
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    texts = [normalize_text(name) for name in names]
+    found = []
+    for name, params in (("char", CHAR_VECTORIZER_PARAMS), ("word", WORD_VECTORIZER_PARAMS)):
+        vectorizer = CountVectorizer(**params)
+        try:
+            counts = vectorizer.fit_transform(texts).tocsr()
+            terms = vectorizer.get_feature_names_out().tolist()
+        except ValueError:  # no terms at all in this chunk
+            counts, terms = csr_matrix((len(texts), 0), dtype=np.int64), []
+        # Normalized text has no newlines, so the terms are stored newline-joined as UTF-8
+        np.savez(spill_dir / f"{chunk_no}_{name}.npz", data=counts.data, indices=counts.indices,
+                 indptr=counts.indptr, terms=np.frombuffer("\n".join(terms).encode(), dtype=np.uint8),
+                 n_rows=len(texts))
+        found.append((terms, np.bincount(counts.indices, minlength=len(terms))))
+    return found
+
+
+def _tfidf_chunk(job):
+    """Pass 2: the spilled counts of one chunk as L2-normalized combined TF-IDF rows, like write_index() stores"""
+    spill_dir, chunk_no = job
+    blocks = []
+    for name, vocabulary, idf in zip(("char", "word"), _vocabularies, _idfs):
+        with np.load(spill_dir / f"{chunk_no}_{name}.npz") as spilled:
+            terms = spilled["terms"].tobytes().decode()
+            terms = terms.split("\n") if terms else []
+            columns = np.fromiter((vocabulary[term] for term in terms), dtype=np.int64, count=len(terms))
+            n_rows = int(spilled["n_rows"])
+            indices = columns[spilled["indices"]]
+            counts = csr_matrix((spilled["data"] * idf[indices], indices, spilled["indptr"]),
+                                shape=(n_rows, len(vocabulary)))
+        # TfidfVectorizer normalizes each feature space before they are combined
+        blocks.append(l2_normalize_rows(counts))
+    return l2_normalize_rows(hstack(blocks))
+
+
+def ordered_map(executor, fn, items, window):
+    """executor.map() that keeps at most `window` items in flight, so a lazy `items` stays lazy"""
+    if executor is None:
+        yield from map(fn, items)
+        return
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _pool(workers, *initargs):
+    if workers <= 1:
+        _init_worker(*initargs)
+        return None
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs)
+
+
+def build_index(chunks, index_dir=INDEX_DIR, workers=WORKERS):
+    """Write and publish an index for `chunks` of (id, course_name[, degree_id, sequence]) rows in catalog order.
+
+    Rows are cleaned like clean_courses() across chunk boundaries: missing
+    names are dropped, the first id of each name is kept and names are
+    stripped. Returns the manifest.
+    """
+    index_dir = Path(index_dir)
+    index_dir.mkdir(parents=True, exist_ok=True)
+    ids, names, seen = [], [], set()
+    metadata = {column: [] for column in METADATA_DEFAULTS}
+    # term -> document frequency while counting, then term -> column (the vocabulary)
+    vocabularies = ({}, {})
+
+    with tempfile.TemporaryDirectory(prefix="spill-", dir=index_dir) as spill_dir:
+        spill_dir = Path(spill_dir)
+
+        def cleaned():
+            for chunk in chunks:
+                chunk = chunk[chunk[COURSE_COL].notna()]
+                keep = []
+                for raw in chunk[COURSE_COL]:
+                    keep.append(raw not in seen)
+                    seen.add(raw)
+                chunk = with_metadata(chunk[keep])
+                chunk_names = chunk[COURSE_COL].astype(str).str.strip().tolist()
+                ids.extend(chunk["id"].tolist())
+                for column, values in metadata.items():
+                    values.append(chunk[column].to_numpy())
+                names.extend(chunk_names)
+                yield spill_dir, len(spilled), chunk_names
+                spilled.append(len(chunk_names))
+
+        # Pass 1: normalize, count and spill each chunk; merge document frequencies
+        spilled = []
+        pool = _pool(workers)
+        try:
+            for found in ordered_map(pool, _count_chunk, cleaned(), workers * 2):
+                for frequencies, (terms, chunk_df) in zip(vocabularies, found):
+                    for term, count in zip(terms, chunk_df.tolist()):
+                        frequencies[term] = frequencies.get(term, 0) + count
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        seen.clear()
+
+        # Same feature order and smoothed IDF as TfidfVectorizer.fit()
+        idfs, column_nnz = [], []
+        for vocabulary in vocabularies:
+            terms = sorted(vocabulary)
+            counts = np.fromiter((vocabulary[term] for term in terms), dtype=np.int64, count=len(terms))
+            idfs.append(np.log((len(names) + 1) / (counts.astype(np.float64) + 1)) + 1.0)
+            column_nnz.append(counts)
+            for column, term in enumerate(terms):
+                vocabulary[term] = column
+            del terms
+
+        char_vectorizer, word_vectorizer = make_vectorizers(*vocabularies)
+        char_vectorizer.idf_, word_vectorizer.idf_ = idfs
+        writer = IndexWriter(ids, names, char_vectorizer, word_vectorizer, np.concatenate(column_nnz), index_dir,
+                             {column: np.concatenate(values or [np.empty(0, dtype=np.int64)])
+                              for column, values in metadata.items()})
+        ids.clear()
+        names.clear()
+        metadata.clear()
+
+        # Pass 2: TF-IDF rows straight into the memory-mapped build
+        pool = _pool(workers, vocabularies, idfs)
+        try:
+            jobs = ((spill_dir, chunk_no) for chunk_no in range(len(spilled)))
+            for rows in ordered_map(pool, _tfidf_chunk, jobs, workers * 2):
+                writer.add_rows(rows)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+    return writer.publish()
+
+
+def peak_rss_mb():
+    """(this process, largest finished child) peak resident memory in MB, or None on Windows"""
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return tuple(resource.getrusage(who).ru_maxrss * scale / 2**20
+                 for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN))
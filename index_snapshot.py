@@ -0,0 +1,113 @@
+# index_snapshot.py
+import hashlib
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import pandas as pd
+
+from catalog_partitions import METADATA_DEFAULTS, CatalogPartitions, with_metadata
+from prefix_index import PrefixIndex
+from similarity_engine import SimilarityEngine
+from text_normalization import clean_text, normalize_text
+from trigram_index import TrigramIndex
+
+COURSE_COL = "course_name"
+# Text columns prepare_courses() adds
+PREPARED_COLUMNS = ("course_norm", "course_no_dots", "course_lower", "course_clean")
+
+
+@dataclass(frozen=True)
+class IndexSnapshot:
+    """Everything a suggestion request reads, published and replaced as one reference.
+
+    Rows of `engine.matrix`, `courses` and both prefix indexes line up, and
+    `version` is the catalog hash used in cache keys; `build` names the
+    on-disk index build it was opened from, if any. `partitions` holds the
+    per-degree rows and the tie-break rank; `hot_set` the
+    suggestion_hot_set.HotSet stored with the build, if any. Snapshots are never
+    mutated after build_snapshot(); reloads build a new one and swap it in,
+    so a request that reads the snapshot once sees a consistent catalog.
+    """
+    char_vectorizer: Any
+    word_vectorizer: Any
+    engine: SimilarityEngine
+    courses: pd.DataFrame
+    ml_prefix_index: PrefixIndex
+    rule_index: PrefixIndex
+    fuzzy_index: TrigramIndex
+    partitions: CatalogPartitions
+    version: str
+    build: Optional[str] = None
+    hot_set: Any = None
+
+    @property
+    def layout_version(self):
+        """`version` that also changes with the row order and tie-break rank.
+
+        A degree_id or sequence edit keeps the names, so `version`, but writes
+        a new build whose rows can be reordered. Anything holding row indices
+        or rank positions across requests keys on this: the MD5 of the build,
+        or `version` for a snapshot that was not opened from one.
+        """
+        return hashlib.md5(self.build.encode()).hexdigest() if self.build else self.version
+
+
+def courses_hash(names):
+    """MD5 over the sorted course names, used as the catalog version"""
+    courses_str = ",".join(sorted(pd.Series(names).astype(str).tolist()))
+    return hashlib.md5(courses_str.encode()).hexdigest()
+
+
+def prepare_courses(df):
+    """Precompute every per-course text form used at query time.
+
+    `course_norm` / `course_no_dots` are the rule-based forms (abbreviations
+    expanded); `course_lower` and `course_clean` are the forms the ML boosts
+    compare against. degree_id and sequence are kept (see catalog_partitions.py).
+    """
+    df = with_metadata(df[[column for column in ["id", COURSE_COL, *METADATA_DEFAULTS] if column in df.columns]])
+    df = df.reset_index(drop=True)
+    df["course_norm"] = df[COURSE_COL].map(normalize_text)
+    df["course_no_dots"] = df["course_norm"].str.replace('.', '', regex=False)
+    df["course_lower"] = df[COURSE_COL].str.lower().str.strip()
+    df["course_clean"] = df[COURSE_COL].map(clean_text)
+    return df
+
+
+def derive_indexes(courses):
+    """{snapshot field: index} for `courses` as prepare_courses() returns them"""
+    course_clean = courses["course_clean"].tolist()
+    rule_forms = [courses["course_norm"].tolist(), courses["course_no_dots"].tolist()]
+    return {
+        # Raw lowercase and no-dots names for prefix boosts, normalized words for word-start boosts
+        "ml_prefix_index": PrefixIndex(
+            name_forms=[courses["course_lower"].tolist(), [name.replace('.', '') for name in course_clean]],
+            word_forms=[course_clean]
+        ),
+        "rule_index": PrefixIndex(name_forms=rule_forms, word_forms=rule_forms),
+        "fuzzy_index": TrigramIndex(courses[COURSE_COL].tolist()),
+        "partitions": CatalogPartitions(courses),
+    }
+
+
+def build_snapshot(char_vectorizer, word_vectorizer, engine, courses, version=None, build=None, indexes=None):
+    """Build a snapshot for `courses`, which must be in `engine.matrix` row order.
+
+    `version` defaults to the courses_hash() of the names. `indexes` are
+    derive_indexes() results read back from an index build, with `courses`
+    already prepared; by default both are computed here.
+    """
+    if len(courses) != engine.n_samples:
+        raise ValueError(f"{len(courses)} courses for a {engine.n_samples}-row similarity matrix")
+    if indexes is None:
+        courses = prepare_courses(courses)
+        indexes = derive_indexes(courses)
+    return IndexSnapshot(
+        char_vectorizer=char_vectorizer,
+        word_vectorizer=word_vectorizer,
+        engine=engine,
+        courses=courses,
+        version=version or courses_hash(courses[COURSE_COL]),
+        build=build,
+        **indexes,
+    )
@@ -1,134 +1,196 @@
-from rapidfuzz import process, fuzz
 # ml_api.py
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
+import base64
 import time
 import sys
 import os
+import re
 import threading
-from course_suggestion_realtime import monitor_courses, fetch_courses_from_db, get_suggestions
-
-# Start background thread to monitor DB changes and reload model/courses every 5 minutes
-threading.Thread(target=monitor_courses, args=(300,), daemon=True).start()
+from typing import NamedTuple, Optional, Tuple
+from course_suggestion_realtime import (add_publish_listener, fetch_courses_from_db, current_snapshot,
+                                        start_monitor, sync_model)
+from suggestion_cache import LRUCache
+import suggestion_metrics
+import suggestion_pipeline
+from suggestion_hot_set import build_hot_set
+from suggestion_pipeline import suggestion_limit
+from text_normalization import clean_text as normalize_ml_text
+from text_normalization import normalize_text
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 app = Flask(__name__)
 CORS(app)
 
-courses_df = None
+# (suggestions, session candidates or None) keyed by (normalized query, limit, snapshot
+# layout_version, degree filter); any catalog or row order change makes old entries unreachable
+CACHE_SIZE = 10000
+suggestion_cache = LRUCache(maxsize=CACHE_SIZE)
+
+# Opt-in keystroke sessions (?session=<token>): token -> (snapshot layout_version, degree filter,
+# query_norm, query_clean, candidate rows) for the session's previous query
+SESSION_CACHE_SIZE = 10000
+MIN_NARROWING_LENGTH = 3
+keystroke_sessions = LRUCache(maxsize=SESSION_CACHE_SIZE)
+
+# Precomputed results for short prefixes and logged top queries of the published snapshot
+# (see suggestion_hot_set.py); taken from the index build, or scored, by reload_courses()
+hot_set = None
+
+COURSE_COL = "course_name"
+
+# Pagination (?limit=, ?offset= or ?cursor=): page size, and how deep results can be paged.
+# Paged requests score the top MAX_RESULT_DEPTH once and cut every page from that cached list.
+MAX_PAGE_LIMIT = 50
+MAX_RESULT_DEPTH = 200
+# layout_version characters in a cursor; a cursor from another catalog or row order is rejected
+CURSOR_VERSION_CHARS = 12
+
+class SearchOptions(NamedTuple):
+    """Filter and page of one /api/suggest request"""
+    degree_ids: Tuple[int, ...] = ()
+    offset: int = 0
+    limit: Optional[int] = None  # None: suggestion_limit(query)
+    cursor_version: Optional[str] = None
+    paginated: bool = False
+
+class SearchOptionError(ValueError):
+    """A filter or page parameter the client has to fix; the message is returned with a 400"""
+
+class CursorError(SearchOptionError):
+    pass
+
+def encode_cursor(version, offset, limit):
+    token = f"{version[:CURSOR_VERSION_CHARS]}:{offset}:{limit}"
+    return base64.urlsafe_b64encode(token.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    """(version prefix, offset, limit) of a cursor made by encode_cursor()"""
+    try:
+        token = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        version, offset, limit = token.split(":")
+        return version, int(offset), int(limit)
+    except ValueError:
+        raise CursorError("Invalid cursor") from None
+
+def parse_int(value, name, low, high):
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise SearchOptionError(f'{name} must be an integer') from None
+    if not low <= number <= high:
+        raise SearchOptionError(f'{name} must be between {low} and {high}')
+    return number
+
+def search_options(args):
+    """SearchOptions from request parameters (a dict-like with .get()); raises SearchOptionError.
+
+    degree_id takes one id or a comma-separated list. cursor carries the
+    offset and limit of the next page; an explicit limit overrides its limit.
+    """
+    degree_ids = ()
+    if args.get('degree_id'):
+        try:
+            degree_ids = tuple(sorted({int(d) for d in args.get('degree_id').split(',') if d.strip()}))
+        except ValueError:
+            raise SearchOptionError('degree_id must be an integer or a comma-separated list of integers') from None
+
+    cursor_version, offset, limit = None, args.get('offset') or 0, args.get('limit') or None
+    if args.get('cursor'):
+        cursor_version, offset, cursor_limit = decode_cursor(args.get('cursor'))
+        limit = limit or cursor_limit
+    offset = parse_int(offset, 'offset', 0, MAX_RESULT_DEPTH - 1)
+    limit = None if limit is None else parse_int(limit, 'limit', 1, MAX_PAGE_LIMIT)
+    if offset + (limit or 0) > MAX_RESULT_DEPTH:
+        raise SearchOptionError(f'offset + limit must be at most {MAX_RESULT_DEPTH}')
+    paginated = bool(args.get('cursor') or args.get('offset') or args.get('limit'))
+    return SearchOptions(degree_ids, offset, limit, cursor_version, paginated)
+
+def narrowed_rows(session, query, layout_version, degree_ids=()):
+    """Candidate rows from the session's previous query when the new query extends it.
+
+    Every course containing the new normalized query also contains the old one,
+    so rule matches are exact. ML neighbours are searched among the candidates
+    only: ML-only abbreviation matches (ml_score >= 80 with no text overlap)
+    are skipped, and text matches just outside the full-catalog neighbour
+    window can still get their ML boost. Backspace, a catalog change or a
+    short query fall back to a full search by returning None.
+    """
+    state = keystroke_sessions.get(session)
+    if state is None:
+        return None
+    prev_layout, prev_degrees, prev_norm, prev_clean, candidates = state
+    query_norm, query_clean = normalize_text(query), normalize_ml_text(query)
+    if (prev_layout, prev_degrees) != (layout_version, degree_ids) or len(query_clean) < MIN_NARROWING_LENGTH:
+        return None
+    if prev_norm in query_norm and prev_clean in query_clean:
+        return candidates
+    return None
+
+def remember_session(session, query, layout_version, candidates, degree_ids=()):
+    keystroke_sessions.put(session, (layout_version, degree_ids, normalize_text(query), normalize_ml_text(query),
+                                     candidates))
+
+_load_lock = threading.Lock()
+_loaded = threading.Event()
 
 def load_courses():
-    """Load courses from database once at startup"""
-    global courses_df
-    if courses_df is None:
-        print("Loading courses from database...")
-        courses_df = fetch_courses_from_db()
-        print(f"Loaded {len(courses_df)} courses for API")
-    return courses_df
+    """The published IndexSnapshot; the first call syncs the model with the database"""
+    if not _loaded.is_set():
+        with _load_lock:
+            if not _loaded.is_set():
+                print("Loading courses from database...")
+                start_time = time.perf_counter()
+                snapshot = sync_model(fetch_courses_from_db())
+                suggestion_metrics.record_reload("startup", time.perf_counter() - start_time)
+                print(f"Loaded {len(snapshot.courses)} courses for API")
+                _loaded.set()
+    return current_snapshot()
 
-@app.route('/api/suggest', methods=['GET'])
-def suggest():
-    start_time = time.time()
-    query = request.args.get('query', '').strip()
-    
+def reload_courses(snapshot):
+    """Called whenever a new snapshot is published"""
+    global hot_set
+    # Entries for the old snapshot can never hit again; free them now instead of waiting for eviction.
+    # Session candidates are row indices into the old snapshot, which a rewrite can reorder.
+    suggestion_cache.clear()
+    keystroke_sessions.clear()
+    # Builds carry their hot set; scoring one here costs every worker seconds per publish
+    hot_set = snapshot.hot_set if snapshot.hot_set is not None else build_hot_set(snapshot, suggestion_limit)
+    print(f"Reloaded {len(snapshot.courses)} courses for API")
 
-    # Query validation: only return error if query has no alphanumeric characters at all
-    import re
-    if not query or not re.search(r'[a-zA-Z0-9]', query):
-        return jsonify({
-            'query': query,
-            'suggestions': [],
-            'count': 0,
-            'message': 'Please enter a valid query containing at least one letter or number.'
-        })
-
-    # Adjusted dynamic limit: more suggestions for "diploma"
-    qlen = len(query)
-    if qlen <= 1:
-        limit = 30
-    elif qlen <= 3:
-        limit = 20
-    elif qlen <= 6:
-        limit = 10
-    else:
-        limit = 8  # Increased from 3 to 8 for queries like "diploma"
-
-    current_courses = load_courses()
-    ml_suggestions = get_suggestions(query, current_courses, top_k=limit)
-
-    # Improved rule-based fallback (aligned with suggest_terminal.py)
-    def normalize_text(text):
-        import re
-        ABBREV = {
-            'mgmt': 'management',
-            'engg': 'engineering',
-            'tech': 'technology',
-            'comm': 'commerce',
-            'sci': 'science',
-            'phy': 'physics',
-            'chem': 'chemistry',
-            'bio': 'biology',
-            # add more as needed
-        }
-        text = str(text).lower().strip()
-        for abbr, full in ABBREV.items():
-            text = re.sub(r'\b' + re.escape(abbr) + r'\b', full, text)
-        text = re.sub(r'[^a-zA-Z0-9\s]', '', text)
-        return " ".join(text.split())
-
-    query_norm = normalize_text(query)
-    query_no_dots = query_norm.replace('.', '')
-    fallback = []
-
-    for idx, row in current_courses.iterrows():
-        course_name = row["course_name"]
-        course_id = int(row["id"])
-        course_norm = normalize_text(course_name)
-        course_no_dots = course_norm.replace('.', '')
-        
-        score = 0
-        if course_norm.startswith(query_norm) or course_no_dots.startswith(query_no_dots):
-            score = 90  # High score for prefix match
-        elif any(word.startswith(query_norm) or word.startswith(query_no_dots) for word in course_norm.split()) or \
-             any(word.startswith(query_norm) or word.startswith(query_no_dots) for word in course_no_dots.split()):
-            score = 70  # Good score for word start match
-        elif query_norm in course_norm or query_no_dots in course_no_dots:
-            score = 30  # Lower score for substring match
-
-        if score > 0:
-            fallback.append((course_name, course_id, score))
-
-    # Merge ML and fallback, prefer higher confidence
-    all_suggestions = {(name, cid): score for name, cid, score in fallback}
-    for name, cid, score in ml_suggestions:
-        if (name, cid) not in all_suggestions or score > all_suggestions[(name, cid)]:
-            all_suggestions[(name, cid)] = score
-
-
-    suggestions = [(name, cid, score) for (name, cid), score in all_suggestions.items()]
-    suggestions.sort(key=lambda x: (-x[2], x[0]))
-    suggestions = suggestions[:limit]
-
-    # Fuzzy fallback if no suggestions (abbreviation/typo handling)
-    if not suggestions:
-        course_names = current_courses["course_name"].tolist()
-        matches = process.extract(
-            query,
-            course_names,
-            scorer=fuzz.WRatio,
-            limit=limit
-        )
-        fuzzy_results = []
-        for name, score, idx in matches:
-            if score < 60:
-                continue
-            course_id = int(current_courses.iloc[idx]["id"])
-            fuzzy_results.append((name, course_id, score))
-        suggestions = fuzzy_results
-
-    response_time = round((time.time() - start_time) * 1000, 2)
+add_publish_listener(reload_courses)
 
-    return jsonify({
+def init(monitor=True):
+    """Load the catalog and start the course monitor (DB checked every 5 minutes).
+
+    Importing this module has no side effects; call init() once per server
+    process. Repeated calls are no-ops. Pre-forking servers load with
+    monitor=False in the parent and call start_monitor() in each worker
+    (see gunicorn.conf.py).
+    """
+    snapshot = load_courses()
+    if monitor:
+        start_monitor(300)
+    return snapshot
+
+MAX_BATCH_QUERIES = 1000
+
+INVALID_QUERY_MESSAGE = 'Please enter a valid query containing at least one letter or number.'
+
+def is_valid_query(query):
+    """Only reject queries with no alphanumeric characters at all"""
+    return bool(query) and re.search(r'[a-zA-Z0-9]', query) is not None
+
+def cache_key(query, limit, catalog_hash, degree_ids=()):
+    """Fold case and surrounding whitespace: neither changes the rule or ML scores.
+
+    Only the fuzzy fallback is case-sensitive, so a query that falls through
+    to it is cached with the scores of the first spelling seen.
+    """
+    return (query.strip().lower(), limit, catalog_hash, degree_ids)
+
+def suggestion_payload(query, suggestions):
+    return {
         'query': query,
         'suggestions': [
             {
@@ -138,23 +200,227 @@ def suggest():
             }
             for name, course_id, score in suggestions
         ],
-        'count': len(suggestions),
-        'response_time_ms': response_time
-    })
+        'count': len(suggestions)
+    }
+
+def invalid_query_payload(query):
+    return {
+        'query': query,
+        'suggestions': [],
+        'count': 0,
+        'message': INVALID_QUERY_MESSAGE
+    }
+
+def page_limit(query, options):
+    """Results per page: the requested limit or suggestion_limit(), within MAX_RESULT_DEPTH"""
+    return min(options.limit or suggestion_limit(query), MAX_RESULT_DEPTH - options.offset)
+
+def suggest_query(query, session=None, options=SearchOptions()):
+    """(page of suggestions, next page cursor or None) for one valid, stripped query.
+
+    Shared by the Flask and ASGI apps. A degree filter scores only that
+    partition of the catalog. Paged requests all cut their page from the
+    same top MAX_RESULT_DEPTH list, so pages never overlap or skip a
+    result, and later pages are cache hits. Raises CursorError for a
+    cursor from another catalog or row order.
+    """
+    limit = MAX_RESULT_DEPTH if options.paginated else suggestion_limit(query)
+    end = options.offset + page_limit(query, options)
+
+    # Read once: a reload mid-request cannot mix two catalogs
+    snapshot = load_courses()
+    layout_version = snapshot.layout_version
+    if options.cursor_version is not None and options.cursor_version != layout_version[:CURSOR_VERSION_CHARS]:
+        raise CursorError('The catalog changed since this cursor was issued; start again from the first page')
+    # The hot set holds full, unfiltered first pages; sessions need candidates it does not keep
+    if not (session or options.paginated or options.degree_ids) and hot_set is not None:
+        with suggestion_metrics.stage_timer("hot"):
+            suggestions = hot_set.get(query, layout_version)
+        if suggestions is not None:
+            return suggestions, None
+
+    partition = snapshot.partitions.rows(options.degree_ids)
+    key = cache_key(query, limit, layout_version, options.degree_ids)
+    with suggestion_metrics.stage_timer("cache"):
+        cached = suggestion_cache.get(key)
+    # Entries from session-less requests skip the substring scan and carry no candidates
+    if cached is not None and (cached[1] is not None or not session):
+        suggestions, candidates = cached
+    else:
+        rows = narrowed_rows(session, query, layout_version, options.degree_ids) if session else None
+        suggestions, candidates = suggestion_pipeline.suggest(query, snapshot, limit, rows=rows,
+                                                              with_candidates=bool(session), partition=partition)
+        # Narrowed results depend on the session's history, so only full searches are shared
+        if rows is None:
+            suggestion_cache.put(key, (suggestions, candidates))
+    if session:
+        remember_session(session, query, layout_version, candidates, options.degree_ids)
+
+    next_cursor = None
+    if options.paginated and len(suggestions) > end:
+        next_cursor = encode_cursor(layout_version, end, min(end - options.offset, MAX_RESULT_DEPTH - end))
+    return suggestions[options.offset:end], next_cursor
+
+def suggest_query_timed(query, session=None, options=SearchOptions()):
+    """suggest_query() plus its per-stage breakdown in ms, for ?debug=timing"""
+    with suggestion_metrics.timing_breakdown() as timings:
+        suggestions, next_cursor = suggest_query(query, session, options)
+    return suggestions, next_cursor, {stage: round(seconds * 1000, 3) for stage, seconds in timings.items()}
+
+def search_payload(query, suggestions, next_cursor, options, timing=None):
+    """/api/suggest response; filter and page fields only when the request used them"""
+    payload = suggestion_payload(query, suggestions)
+    if options.degree_ids:
+        payload['degree_id'] = list(options.degree_ids)
+    if options.paginated:
+        payload['offset'] = options.offset
+        payload['limit'] = page_limit(query, options)
+        payload['next_cursor'] = next_cursor
+    if timing is not None:
+        payload['timing_ms'] = timing
+    return payload
+
+def batch_error(queries):
+    """Error message for an invalid batch request body, or None"""
+    if not isinstance(queries, list) or not all(isinstance(q, str) for q in queries):
+        return 'Request body must be JSON like {"queries": ["mba", "b.tech"]}'
+    if len(queries) > MAX_BATCH_QUERIES:
+        return f'At most {MAX_BATCH_QUERIES} queries per batch'
+    return None
+
+def suggest_queries(queries):
+    """Per-query payloads for a validated batch.
+
+    All uncached valid queries are vectorized together and scored in a single
+    similarity pass; each result uses the /api/suggest response schema.
+    """
+    queries = [q.strip() for q in queries]
+    snapshot = load_courses()
+    layout_version = snapshot.layout_version
+
+    results = [invalid_query_payload(q) for q in queries]
+    misses = []
+    for i, query in enumerate(queries):
+        if not is_valid_query(query):
+            continue
+        hot = hot_set.get(query, layout_version) if hot_set is not None else None
+        if hot is not None:
+            results[i] = suggestion_payload(query, hot)
+            continue
+        key = cache_key(query, suggestion_limit(query), layout_version)
+        cached = suggestion_cache.get(key)
+        if cached is None:
+            misses.append((i, key))
+        else:
+            results[i] = suggestion_payload(query, cached[0])
+
+    limits = [key[1] for _, key in misses]
+    batch = suggestion_pipeline.suggest_batch([queries[i] for i, _ in misses], snapshot, limits)
+    for (i, key), suggestions in zip(misses, batch):
+        suggestion_cache.put(key, (suggestions, None))
+        results[i] = suggestion_payload(queries[i], suggestions)
+    return results
+
+def elapsed_ms(start_time, endpoint=None):
+    """Milliseconds since `start_time`, also observed as an `endpoint` request when given"""
+    seconds = time.time() - start_time
+    if endpoint is not None:
+        suggestion_metrics.REQUEST_SECONDS.observe(seconds, endpoint)
+    return round(seconds * 1000, 2)
+
+def metrics_text():
+    """Prometheus exposition of this process's metrics, including both caches and the hot set"""
+    caches = {'suggestions': suggestion_cache, 'sessions': keystroke_sessions}
+    if hot_set is not None:
+        caches['hot'] = hot_set
+    return suggestion_metrics.render(caches, hot_set)
+
+METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def wants_timing(args):
+    return args.get('debug') == 'timing'
+
+@app.route('/api/suggest', methods=['GET'])
+def suggest():
+    start_time = time.time()
+    query = request.args.get('query', '').strip()
+    
+
+    # Query validation: only return error if query has no alphanumeric characters at all
+    if not is_valid_query(query):
+        return jsonify(invalid_query_payload(query))
+
+    session = request.args.get('session')
+    try:
+        options = search_options(request.args)
+        if wants_timing(request.args):
+            suggestions, next_cursor, timing = suggest_query_timed(query, session, options)
+        else:
+            (suggestions, next_cursor), timing = suggest_query(query, session, options), None
+    except SearchOptionError as e:
+        return jsonify({'error': str(e)}), 400
+
+    payload = search_payload(query, suggestions, next_cursor, options, timing)
+    payload['response_time_ms'] = elapsed_ms(start_time, 'suggest')
+    return jsonify(payload)
+
+@app.route('/api/suggest/batch', methods=['POST'])
+def suggest_batch():
+    """Suggestions for a list of queries: {"queries": ["mba", "b.tech", ...]}"""
+    start_time = time.time()
+    body = request.get_json(silent=True)
+    queries = body.get('queries') if isinstance(body, dict) else None
+
+    error = batch_error(queries)
+    if error:
+        return jsonify({'error': error}), 400
+
+    results = suggest_queries(queries)
 
-@app.route('/', methods=['GET'])
-def home():
     return jsonify({
+        'results': results,
+        'count': len(results),
+        'response_time_ms': elapsed_ms(start_time, 'suggest_batch')
+    })
+
+def cache_stats_payload():
+    """Suggestion cache stats, plus the hot set's size, hits, build time and memory under 'hot_set'"""
+    stats = suggestion_cache.stats()
+    stats['hot_set'] = hot_set.stats() if hot_set is not None else None
+    return stats
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """Suggestion cache size and hit/miss/eviction counters, for sizing CACHE_SIZE"""
+    return jsonify(cache_stats_payload())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Stage latency histograms, result path counters, cache and reload metrics (Prometheus text format)"""
+    return Response(metrics_text(), content_type=METRICS_CONTENT_TYPE)
+
+def usage_payload():
+    return {
         'title': '🎓 Course Suggestion API',
         'description': 'Type any search term and get course suggestions',
         'usage': 'GET /api/suggest?query=YOUR_SEARCH_HERE',
+        'session_usage': 'Add &session=ANY_TOKEN per typing session to narrow each keystroke to the previous matches',
+        'batch_usage': 'POST /api/suggest/batch with {"queries": ["mba", "b.tech"]}',
+        'filter_usage': 'Add &degree_id=2 (or 2,3) to search only those degrees',
+        'page_usage': f'Add &limit=N (at most {MAX_PAGE_LIMIT}) and &offset=N, or follow next_cursor with &cursor=',
+        'debug_usage': 'Add &debug=timing for a per-stage timing_ms breakdown; GET /metrics for Prometheus',
         'note': 'Replace YOUR_SEARCH_HERE with anything you want to search for'
-    })
+    }
+
+@app.route('/', methods=['GET'])
+def home():
+    return jsonify(usage_payload())
 
 if __name__ == '__main__':
     print("🎓 Starting Course Suggestion API...")
     print("📡 API: http://localhost:5002/api/suggest?query=YOUR_SEARCH")
     print("💡 In Postman: Just change YOUR_SEARCH to anything you want!")
     print("   Example: http://localhost:5002/api/suggest?query=engineering")
-    load_courses()
+    print("🚀 Production (multi-process): gunicorn -c gunicorn.conf.py")
+    init()
     app.run(debug=True, host='0.0.0.0', port=5002)
\ No newline at end of file
@@ -0,0 +1,243 @@
+# ml_api_async.py
+"""ASGI variant of the suggestion API: same routes and response schema as ml_api.py.
+
+    uvicorn ml_api_async:app --port 5002
+
+`app` is a plain ASGI callable, so any ASGI server works and no web
+framework is needed. The event loop only parses requests and writes
+responses; it can hold thousands of idle keep-alive connections.
+
+- Scoring runs in a bounded thread pool (SCORING_THREADS). At most that many
+  jobs are handed to the pool; other requests wait on the loop.
+- When the client disconnects first, the request is cancelled. A job that
+  is still waiting never runs. A job that already started finishes in its
+  thread and its result is dropped.
+- Catalog refresh never blocks the loop. The index loads in the pool at
+  startup (lifespan; servers without it load on the first request and do
+  not start the monitor), the course monitor or index follower runs in
+  its own thread, and new snapshots are swapped in with one assignment.
+"""
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import ml_api
+
+# ========== CONFIG ==========
+SCORING_THREADS = int(os.environ.get("COURSE_API_SCORING_THREADS", os.cpu_count() or 4))
+MAX_BODY_BYTES = 1 << 20
+
+_executor = ThreadPoolExecutor(max_workers=SCORING_THREADS, thread_name_prefix="scoring")
+# One slot per pool thread, released when the job finishes (not when its request is cancelled)
+_slots = asyncio.Semaphore(SCORING_THREADS)
+
+CORS_HEADERS = [(b"access-control-allow-origin", b"*")]
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+async def run_scoring(fn, *args):
+    """Run `fn(*args)` in the scoring pool, waiting on the loop for a free thread"""
+    await _slots.acquire()
+    loop = asyncio.get_running_loop()
+    try:
+        job = _executor.submit(fn, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    job.add_done_callback(lambda _: loop.call_soon_threadsafe(_slots.release))
+    return await asyncio.wrap_future(job)
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def score_unless_disconnected(receive, fn, *args):
+    """Result of `fn(*args)`, or None if the client went away first"""
+    scoring = asyncio.ensure_future(run_scoring(fn, *args))
+    disconnect = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        await asyncio.wait({scoring, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        disconnect.cancel()
+    if not scoring.done():
+        scoring.cancel()
+        return None
+    return scoring.result()
+
+
+async def read_body(receive):
+    """Request body, or None when it exceeds MAX_BODY_BYTES"""
+    body = b""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise ClientDisconnected
+        body += message.get("body", b"")
+        if len(body) > MAX_BODY_BYTES:
+            return None
+        if not message.get("more_body", False):
+            return body
+
+
+def query_params(scope):
+    return parse_qs(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)
+
+
+def header(scope, name):
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return ""
+
+
+async def send_body(send, status, body, content_type):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", content_type), (b"content-length", str(len(body)).encode())]
+                   + CORS_HEADERS,
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_json(send, status, payload):
+    # Same serialization as Flask's jsonify: sorted keys, compact, ASCII-escaped, trailing newline
+    body = (json.dumps(payload, sort_keys=True, separators=(",", ":")) + "\n").encode()
+    await send_body(send, status, body, b"application/json")
+
+
+async def suggest(scope, receive):
+    start_time = time.time()
+    params = query_params(scope)
+    query = params.get("query", [""])[0].strip()
+
+    if not ml_api.is_valid_query(query):
+        return 200, ml_api.invalid_query_payload(query)
+
+    args = {name: values[0] for name, values in params.items()}
+    session = args.get("session")
+    # The breakdown is collected in the scoring thread, where the stages run
+    timed = ml_api.wants_timing(args)
+    try:
+        options = ml_api.search_options(args)
+        scored = await score_unless_disconnected(receive, ml_api.suggest_query_timed if timed else ml_api.suggest_query,
+                                                 query, session, options)
+    except ml_api.SearchOptionError as e:
+        return 400, {"error": str(e)}
+    if scored is None:
+        return None
+    suggestions, next_cursor, timing = scored if timed else (*scored, None)
+
+    payload = ml_api.search_payload(query, suggestions, next_cursor, options, timing)
+    payload["response_time_ms"] = ml_api.elapsed_ms(start_time, "suggest")
+    return 200, payload
+
+
+async def suggest_batch(scope, receive):
+    start_time = time.time()
+    body = await read_body(receive)
+    if body is None:
+        return 413, {"error": f"Request body is larger than {MAX_BODY_BYTES} bytes"}
+
+    # Like Flask's get_json(silent=True): only JSON content types, unparseable bodies read as None
+    data = None
+    content_type = header(scope, b"content-type").split(";")[0].strip()
+    if content_type == "application/json" or content_type.endswith("+json"):
+        try:
+            data = json.loads(body)
+        except ValueError:
+            pass
+    queries = data.get("queries") if isinstance(data, dict) else None
+
+    error = ml_api.batch_error(queries)
+    if error:
+        return 400, {"error": error}
+
+    results = await score_unless_disconnected(receive, ml_api.suggest_queries, queries)
+    if results is None:
+        return None
+    return 200, {"results": results, "count": len(results), "response_time_ms": ml_api.elapsed_ms(start_time, "suggest_batch")}
+
+
+async def cache_stats(scope, receive):
+    return 200, ml_api.cache_stats_payload()
+
+
+async def metrics(scope, receive):
+    return 200, ml_api.metrics_text()
+
+
+async def home(scope, receive):
+    return 200, ml_api.usage_payload()
+
+
+ROUTES = {
+    "/api/suggest": ("GET", suggest),
+    "/api/suggest/batch": ("POST", suggest_batch),
+    "/api/cache/stats": ("GET", cache_stats),
+    "/metrics": ("GET", metrics),
+    "/": ("GET", home),
+}
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            try:
+                # Loads the catalog and starts the monitor thread, off the event loop
+                await asyncio.get_running_loop().run_in_executor(_executor, ml_api.init)
+            except Exception as e:
+                await send({"type": "lifespan.startup.failed", "message": str(e)})
+                return
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            _executor.shutdown(wait=False, cancel_futures=True)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+
+    route = ROUTES.get(scope["path"])
+    method = scope["method"]
+    if route is None:
+        return await send_json(send, 404, {"error": "Not found"})
+    allowed, handler = route
+    if method == "OPTIONS":
+        # CORS preflight
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": CORS_HEADERS + [
+                (b"access-control-allow-methods", f"{allowed}, OPTIONS".encode()),
+                (b"access-control-allow-headers", header(scope, b"access-control-request-headers").encode() or b"*"),
+                (b"content-length", b"0"),
+            ],
+        })
+        return await send({"type": "http.response.body", "body": b""})
+    if method != allowed and not (method == "HEAD" and allowed == "GET"):
+        return await send_json(send, 405, {"error": "Method not allowed"})
+
+    try:
+        response = await handler(scope, receive)
+    except ClientDisconnected:
+        return
+    if response is None:
+        return
+    status, payload = response
+    if isinstance(payload, str):
+        return await send_body(send, status, payload.encode(), ml_api.METRICS_CONTENT_TYPE.encode())
+    await send_json(send, status, payload)
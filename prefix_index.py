@@ -0,0 +1,66 @@
+# prefix_index.py
+import numpy as np
+
+# Sorts after every character a course name can contain, so [q, q + PREFIX_END)
+# is exactly the key range starting with q. Keys are UTF-8, whose byte order is code point order.
+PREFIX_END = "\U0010ffff".encode("utf-8")
+
+
+def encode(text):
+    # surrogatepass keeps any str encodable, still in code point order
+    return text.encode("utf-8", "surrogatepass")
+
+
+class PrefixIndex:
+    """Sorted-key index answering "does the name, or any word in it, start with the query?"
+
+    `name_forms` and `word_forms` are lists of name lists aligned with the
+    catalog rows (e.g. dotted and no-dots forms). Keys are a sorted
+    fixed-width bytes array, so lookups are a searchsorted over it and
+    prefix and word-start candidates come back in O(log N + k). The arrays
+    are stored in each index build (index_artifact.py) and come back
+    memory-mapped through from_arrays().
+    """
+    ARRAYS = ("full_keys", "full_rows", "word_keys", "word_rows")
+
+    def __init__(self, name_forms, word_forms=()):
+        full = sorted({(encode(name), row) for names in name_forms for row, name in enumerate(names)})
+        self._full_keys = np.array([key for key, _ in full], dtype=bytes)
+        self._full_rows = np.array([row for _, row in full], dtype=np.int64)
+
+        words = sorted({
+            (encode(word), row)
+            for names in word_forms
+            for row, name in enumerate(names)
+            for word in name.split()
+        })
+        self._word_keys = np.array([key for key, _ in words], dtype=bytes)
+        self._word_rows = np.array([row for _, row in words], dtype=np.int64)
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Index over the arrays() of one built the same way"""
+        index = cls.__new__(cls)
+        for name in cls.ARRAYS:
+            setattr(index, f"_{name}", arrays[name])
+        return index
+
+    def arrays(self):
+        """{name: array} for every name in ARRAYS"""
+        return {name: getattr(self, f"_{name}") for name in self.ARRAYS}
+
+    @staticmethod
+    def _lookup(keys, rows, query):
+        query = encode(query)
+        lo, hi = keys.searchsorted([query, query + PREFIX_END])
+        return np.unique(rows[lo:hi])
+
+    def prefix_rows(self, *queries):
+        """Rows whose name starts with any of the queries"""
+        found = [self._lookup(self._full_keys, self._full_rows, q) for q in queries]
+        return np.unique(np.concatenate(found)) if found else np.empty(0, dtype=np.int64)
+
+    def word_start_rows(self, *queries):
+        """Rows where some word of the name starts with any of the queries"""
+        found = [self._lookup(self._word_keys, self._word_rows, q) for q in queries]
+        return np.unique(np.concatenate(found)) if found else np.empty(0, dtype=np.int64)
@@ -0,0 +1,174 @@
+# suggestion_hot_set.py
+"""Complete result lists for the shortest and most frequent queries, computed when a catalog is loaded.
+
+Most /api/suggest traffic is 1-3 character prefixes. They get the largest
+limits and the most expensive rule scans, but a catalog only has a few
+thousand of them. build_hot_set() scores in one suggest_batch() call:
+- every prefix of up to HOT_PREFIX_DEPTH characters of each lowercased
+  course name and of each word in it,
+- the HOT_QUERY_TOP_N most frequent queries in the HOT_QUERY_LOG access log,
+  when one is configured.
+Those queries are then answered by a dict lookup.
+
+Keys are folded like the suggestion cache keys (stripped, lowercased). So
+the fuzzy fallback, the only case-sensitive stage, scores the lowercase
+spelling. The build time and the approximate memory of every build are
+printed and exported on /metrics, for tuning the depth.
+
+index_artifact.py scores the hot set once per index build, in the process
+that writes it, and stores it as HOT_SET_FILE in the build directory; API
+processes only read that file back. Snapshots without one (builds written
+before it was stored, or built in-process) are scored by every process
+that publishes them.
+"""
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from urllib.parse import parse_qs
+
+import suggestion_pipeline
+from suggestion_metrics import metrics_paused
+
+# ========== CONFIG ==========
+# Longest precomputed name prefix in characters; 0 turns the prefixes off. Read where the index is
+# written (course monitor, retrain_course_model.py, train_module.py), which scores the hot set for
+# each build: about 6 s at depth 3 for 100k synthetic courses. Only builds without a stored hot set
+# cost that in every API worker, on every publish.
+HOT_PREFIX_DEPTH = int(os.environ.get("COURSE_HOT_PREFIX_DEPTH", 3))
+# Access log (gunicorn or Flask format) whose most frequent /api/suggest queries are precomputed too
+HOT_QUERY_LOG = os.environ.get("COURSE_HOT_QUERY_LOG")
+HOT_QUERY_TOP_N = int(os.environ.get("COURSE_HOT_QUERY_TOP_N", 1000))
+HOT_SET_FILE = "hot_set.json"
+
+COURSE_COL = "course_name"
+LOGGED_QUERY = re.compile(r"/api/suggest\?(\S+)")
+
+
+def fold(query):
+    """Same folding as ml_api.cache_key()"""
+    return query.strip().lower()
+
+
+def catalog_prefixes(names, depth=HOT_PREFIX_DEPTH):
+    """Folded 1..depth character prefixes of every name and of every word in it"""
+    prefixes = set()
+    for name in names:
+        name = fold(name)
+        for text in [name] + name.split()[1:]:
+            prefixes.update(fold(text[:n]) for n in range(1, depth + 1))
+    return prefixes
+
+
+def logged_queries(path, top_n=HOT_QUERY_TOP_N):
+    """The `top_n` most frequent folded /api/suggest queries in an access log"""
+    counts = Counter()
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            match = LOGGED_QUERY.search(line)
+            if match:
+                query = parse_qs(match.group(1)).get("query", [""])[0]
+                counts[fold(query)] += 1
+    return [query for query, _ in counts.most_common(top_n)]
+
+
+def approximate_bytes(results):
+    """sys.getsizeof() of the dict and every key, list, tuple and value in it, counting shared objects once"""
+    seen = set()
+    total = 0
+    stack = [results]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            stack.extend(obj)
+    return total
+
+
+class HotSet:
+    """{folded query: suggestions} for one snapshot layout_version, with LRUCache-style hit counters"""
+
+    def __init__(self, layout_version, results, seconds, nbytes):
+        self.layout_version = layout_version
+        self._results = results
+        self.seconds = seconds
+        self.nbytes = nbytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, query, layout_version):
+        """Precomputed suggestions for `query`, or None when it is not hot or the snapshot has changed"""
+        suggestions = self._results.get(fold(query)) if layout_version == self.layout_version else None
+        with self._lock:
+            if suggestions is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return suggestions
+
+    def __len__(self):
+        return len(self._results)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._results),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': 0,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'build_seconds': round(self.seconds, 3),
+                'bytes': self.nbytes
+            }
+
+
+def build_hot_set(snapshot, limit_for=suggestion_pipeline.suggestion_limit, depth=HOT_PREFIX_DEPTH,
+                  log_path=HOT_QUERY_LOG, top_n=HOT_QUERY_TOP_N):
+    """Score every hot query of `snapshot` at limit_for(query) results"""
+    start = time.perf_counter()
+    queries = catalog_prefixes(snapshot.courses[COURSE_COL].tolist(), depth) if depth > 0 else set()
+    if log_path:
+        try:
+            queries.update(logged_queries(log_path, top_n))
+        except OSError as e:
+            print(f"⚠️ Could not read hot query log {log_path}: {e}")
+    # Only queries the API would score (see ml_api.is_valid_query)
+    queries = sorted(query for query in queries if re.search(r"[a-z0-9]", query))
+
+    # Thousands of precomputed queries per reload would swamp the request-traffic stage and path metrics
+    with metrics_paused():
+        batch = suggestion_pipeline.suggest_batch(queries, snapshot, [limit_for(query) for query in queries])
+    results = dict(zip(queries, batch))
+    hot_set = HotSet(snapshot.layout_version, results, time.perf_counter() - start, approximate_bytes(results))
+    print(f"🔥 Precomputed {len(hot_set)} hot queries in {hot_set.seconds:.2f}s "
+          f"({hot_set.nbytes / 2**20:.1f} MB, prefix depth {depth})")
+    return hot_set
+
+
+def save_hot_set(hot_set, path):
+    """Write the results and build time of `hot_set` as JSON"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"seconds": hot_set.seconds, "results": hot_set._results}, f, ensure_ascii=False)
+
+
+def load_hot_set(path, layout_version):
+    """HotSet saved by save_hot_set() for the snapshot with `layout_version`, or None when there is no file"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            saved = json.load(f)
+    except FileNotFoundError:
+        return None
+    results = {query: [tuple(suggestion) for suggestion in suggestions]
+               for query, suggestions in saved["results"].items()}
+    return HotSet(layout_version, results, saved["seconds"], approximate_bytes(results))
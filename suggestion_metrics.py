@@ -0,0 +1,219 @@
+# suggestion_metrics.py
+"""In-process metrics for the suggestion hot path, rendered in the Prometheus text format.
+
+- Histograms: time per pipeline stage (stage_timer), per API request and
+  per catalog reload.
+- Counters: which stage produced each result list (record_path), which
+  stages the early exit skipped, and failed catalog monitor ticks.
+- Cache gauges, read from the LRUCache counters when /metrics is scraped,
+  and the size, build time and memory of the hot set.
+
+Recording a value is a perf_counter() pair, a bisect and a locked increment,
+so it stays on in production. Values are per process: with several gunicorn
+workers each scrape sees the worker that answered it, so scrape them
+individually or compare rates rather than totals.
+
+Wrap a request in timing_breakdown() to also collect that request's stage
+times (the ?debug=timing response field). Work that is not request traffic,
+such as precomputing the hot set, runs under metrics_paused() so it leaves
+the counters and histograms alone.
+"""
+import bisect
+import contextvars
+import threading
+import time
+
+# ========== CONFIG ==========
+# Upper bounds in seconds; the hot-path stages run in tens of microseconds to tens of milliseconds
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1.0, 2.5)
+RELOAD_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+
+# False while metrics_paused() is active in this context
+_recording = contextvars.ContextVar("metrics_recording", default=True)
+
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    """Cumulative-bucket histogram with one series per combination of label values"""
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [per-bucket counts (+Inf last), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        if not _recording.get():
+            return
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(values, list(counts), total) for values, (counts, total) in sorted(self._series.items())]
+        for values, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, values)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, values)} {cumulative}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter with one series per combination of label values"""
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        if not _recording.get():
+            return
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        lines.extend(f"{self.name}{_format_labels(self.labels, labels)} {value}" for labels, value in values)
+        return lines
+
+
+STAGE_SECONDS = Histogram("course_suggest_stage_seconds", "Time spent in each suggestion pipeline stage",
+                          ("stage",))
+REQUEST_SECONDS = Histogram("course_api_request_seconds", "API request handling time", ("endpoint",))
+RESULT_PATHS = Counter("course_suggest_results_total",
+                       "Computed suggestion lists by the stages that produced them (ml, rule, ml_rule, fuzzy, empty)",
+                       ("path",))
+SKIPPED_STAGES = Counter("course_suggest_skipped_total",
+                         "Stages the early exit skipped because the top-k was already settled", ("stage",))
+RELOAD_SECONDS = Histogram("course_reload_seconds", "Time to bring a changed catalog or index build into service",
+                           ("source",), RELOAD_BUCKETS)
+LAST_RELOAD = {}  # source -> time.time() of the last reload
+MONITOR_ERRORS = Counter("course_monitor_errors_total",
+                         "Failed catalog polls, updates or takeovers, retried on the next tick", ("source",))
+
+METRICS = [STAGE_SECONDS, REQUEST_SECONDS, RESULT_PATHS, SKIPPED_STAGES, RELOAD_SECONDS, MONITOR_ERRORS]
+
+# Stage name -> seconds for the request being timed, see timing_breakdown()
+_breakdown = contextvars.ContextVar("timing_breakdown", default=None)
+
+
+class stage_timer:
+    """`with stage_timer("vectorize"):` observes the block under that stage"""
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        STAGE_SECONDS.observe(elapsed, self.stage)
+        breakdown = _breakdown.get()
+        if breakdown is not None:
+            breakdown[self.stage] = breakdown.get(self.stage, 0.0) + elapsed
+        return False
+
+
+class timing_breakdown:
+    """`with timing_breakdown() as timings:` collects {stage: seconds} for the code it wraps (this thread only)"""
+
+    def __enter__(self):
+        self.timings = {}
+        self._token = _breakdown.set(self.timings)
+        return self.timings
+
+    def __exit__(self, *exc):
+        _breakdown.reset(self._token)
+        return False
+
+
+class metrics_paused:
+    """`with metrics_paused():` drops every observation made by the code it wraps (this thread only)"""
+
+    def __enter__(self):
+        self._token = _recording.set(False)
+        return self
+
+    def __exit__(self, *exc):
+        _recording.reset(self._token)
+        return False
+
+
+def record_path(path):
+    RESULT_PATHS.inc(path)
+
+
+def record_reload(source, seconds):
+    RELOAD_SECONDS.observe(seconds, source)
+    LAST_RELOAD[source] = time.time()
+
+
+def cache_lines(caches):
+    """Gauge and counter lines for {name: LRUCache}"""
+    stats = {name: cache.stats() for name, cache in caches.items()}
+    lines = []
+    for metric, kind, key, documentation in (
+        ("course_cache_hits_total", "counter", "hits", "Cache lookups that found an entry"),
+        ("course_cache_misses_total", "counter", "misses", "Cache lookups that found nothing"),
+        ("course_cache_evictions_total", "counter", "evictions", "Entries evicted to stay within maxsize"),
+        ("course_cache_entries", "gauge", "size", "Entries currently cached"),
+        ("course_cache_hit_ratio", "gauge", "hit_rate", "Hits over all lookups since start"),
+    ):
+        lines += [f"# HELP {metric} {documentation}", f"# TYPE {metric} {kind}"]
+        lines += [f'{metric}{{cache="{name}"}} {values[key]}' for name, values in sorted(stats.items())]
+    return lines
+
+
+def hot_set_lines(hot_set):
+    """Gauge lines for the cost of the current suggestion_hot_set.HotSet"""
+    lines = []
+    for metric, value, documentation in (
+        ("course_hot_set_build_seconds", hot_set.seconds, "Time to precompute the current hot set"),
+        ("course_hot_set_bytes", hot_set.nbytes, "Approximate memory held by the hot set's results"),
+    ):
+        lines += [f"# HELP {metric} {documentation}", f"# TYPE {metric} gauge", f"{metric} {value}"]
+    return lines
+
+
+def render(caches=None, hot_set=None):
+    """Every metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    lines += ["# HELP course_last_reload_timestamp_seconds Unix time of the last reload",
+              "# TYPE course_last_reload_timestamp_seconds gauge"]
+    lines += [f'course_last_reload_timestamp_seconds{{source="{source}"}} {stamp}'
+              for source, stamp in sorted(LAST_RELOAD.items())]
+    if caches:
+        lines += cache_lines(caches)
+    if hot_set is not None:
+        lines += hot_set_lines(hot_set)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,365 @@
+# suggestion_pipeline.py
+"""Course suggestions as one pipeline: candidate generation → scoring → merge → top-k.
+
+Every entry point (Flask and ASGI APIs, terminal, console, batch jobs) and
+both training scripts go through this module, so the text that is indexed
+and the text that is queried are normalized the same way:
+
+- TF-IDF vectors, at train and at query time: normalize_text (abbreviations
+  expanded), see fit_model() and vectorize_queries().
+- ML boosts: clean_text forms (no expansion), precomputed per course.
+- Rule tiers: normalize_text forms, precomputed per course.
+
+Stages run in this order, each one only when enabled in `stages`:
+
+- "ml": TF-IDF neighbours plus text boosts, scores up to 100.
+- "rule": prefix 90 and word start 70 from the prefix index, then 30 for
+  any other substring (a scan over the catalog or the session's rows).
+- "fuzzy": WRatio >= FUZZY_CUTOFF over the n-gram shortlist, only when no
+  other stage found anything.
+
+Scores are merged per course (highest wins) and sorted by (-score, rank),
+the precomputed (sequence, name) order of snapshot.partitions.
+A stage, or the substring scan, is skipped once `limit` results already
+score above anything it can add, since it can no longer change the top-k.
+Stage times, skips and the producing path are recorded in suggestion_metrics.
+"""
+import heapq
+import os
+
+import numpy as np
+from scipy.sparse import hstack
+
+from suggestion_metrics import SKIPPED_STAGES, record_path, stage_timer
+from text_normalization import clean_text, normalize_text
+
+# ========== CONFIG ==========
+COURSE_COL = "course_name"
+# Comma-separated stages run by default, e.g. "rule,fuzzy" to serve without the ML stage
+STAGES = tuple(os.environ.get("COURSE_SUGGEST_STAGES", "ml,rule,fuzzy").split(","))
+ML_MAX_SCORE = 100
+RULE_PREFIX_SCORE = 90
+RULE_WORD_START_SCORE = 70
+RULE_SUBSTRING_SCORE = 30
+FUZZY_CUTOFF = 60
+# TF-IDF features of the index: char n-grams within word boundaries, plus words and word pairs
+CHAR_VECTORIZER_PARAMS = {"analyzer": "char_wb", "ngram_range": (2, 4)}
+WORD_VECTORIZER_PARAMS = {"analyzer": "word", "ngram_range": (1, 2)}
+
+
+# ========== Training ==========
+def make_vectorizers(char_vocabulary=None, word_vocabulary=None):
+    """Unfitted (char_vectorizer, word_vectorizer), optionally with fixed vocabularies"""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    return (TfidfVectorizer(vocabulary=char_vocabulary, **CHAR_VECTORIZER_PARAMS),
+            TfidfVectorizer(vocabulary=word_vocabulary, **WORD_VECTORIZER_PARAMS))
+
+
+def fit_model(names):
+    """Fit the char and word TF-IDF vectorizers on course names.
+
+    Returns (char_vectorizer, word_vectorizer, matrix) with matrix rows in
+    `names` order; write them with index_artifact.write_index(). Large
+    catalogs are built in chunks by index_builder.py instead.
+    """
+    texts = [normalize_text(name) for name in names]
+    char_vectorizer, word_vectorizer = make_vectorizers()
+    matrix = hstack([char_vectorizer.fit_transform(texts), word_vectorizer.fit_transform(texts)]).tocsr()
+    return char_vectorizer, word_vectorizer, matrix
+
+
+def vectorize_texts(snapshot, texts):
+    """Combined char + word TF-IDF rows for already-normalized texts"""
+    return hstack([snapshot.char_vectorizer.transform(texts), snapshot.word_vectorizer.transform(texts)]).tocsr()
+
+
+def vectorize_queries(snapshot, queries):
+    """Char + word TF-IDF features for a list of queries, normalized like the indexed names"""
+    with stage_timer("normalize"):
+        texts = [normalize_text(query) for query in queries]
+    with stage_timer("vectorize"):
+        return vectorize_texts(snapshot, texts)
+
+
+# ========== ML stage ==========
+def rank_neighbors(query, snapshot, distances, indices, top_k=8):
+    """Apply text boosts and relevance gates to one query's nearest neighbours.
+
+    Every candidate is scored at once from the snapshot's precomputed
+    `course_clean` forms and prefix index: boost tiers 100 exact, 90 prefix,
+    70 word start, 30 substring on top of the ML score, then the relevance
+    gates and the 40% threshold.
+    """
+    query_normalized = clean_text(query)
+    query_no_dots = query_normalized.replace('.', '')
+    query_lower = query.lower().strip()
+    query_clean = query_no_dots
+
+    courses_df = snapshot.courses
+    indices = np.asarray(indices)
+    valid = indices < len(courses_df)
+    indices, distances = indices[valid], np.asarray(distances)[valid]
+    if len(indices) == 0:
+        return []
+
+    # int() truncation of the similarity percentage, floored at 0
+    ml_score = np.maximum(0, ((1 - distances) * 100).astype(np.int64))
+    course_clean = courses_df['course_clean'].to_numpy()[indices].astype(str)
+    course_no_dots = np.char.replace(course_clean, '.', '')
+
+    exact = course_clean == query_clean
+    prefix = np.isin(indices, snapshot.ml_prefix_index.prefix_rows(query_lower, query_no_dots))
+    word_start = np.isin(indices, snapshot.ml_prefix_index.word_start_rows(query_no_dots))
+    substring = (np.char.find(course_clean, query_clean) >= 0) | (np.char.find(course_no_dots, query_no_dots) >= 0)
+
+    boost = np.select([exact, prefix, word_start, substring], [100, 90, 70, 30], default=0)
+    final_score = np.minimum(100, ml_score + boost)
+
+    if len(query_clean) >= 3:
+        # A text match is required, and it must be a real connection (not only a
+        # raw-name prefix), except ML >= 80 for short abbreviations like "bttm"
+        has_connection = substring | word_start | exact
+        if len(query_clean) <= 5:
+            has_connection |= ml_score >= 80
+        relevant = (boost > 0) & has_connection
+    else:
+        # Shorter queries also accept high ML scores
+        relevant = (boost > 0) | (ml_score >= 70)
+
+    keep = relevant & (final_score >= 40)
+    kept, kept_scores = indices[keep], final_score[keep]
+    order = np.lexsort((snapshot.partitions.rank[kept], -kept_scores))[:top_k]
+    kept, kept_scores = kept[order], kept_scores[order]
+    return list(zip(
+        courses_df[COURSE_COL].to_numpy()[kept].tolist(),
+        courses_df['id'].to_numpy()[kept].astype(int).tolist(),
+        kept_scores.tolist()
+    ))
+
+
+def get_suggestions(query, snapshot, top_k=8, rows=None):
+    """ML suggestions for one query; `rows` limits neighbour search to those catalog rows"""
+    if not query.strip():
+        return []
+
+    max_neighbors = min(top_k * 2, len(snapshot.courses) if rows is None else len(rows))
+    if max_neighbors == 0:
+        return []
+
+    try:
+        X_query = vectorize_queries(snapshot, [query])
+        with stage_timer("kneighbors"):
+            distances, indices = snapshot.engine.kneighbors(X_query, n_neighbors=max_neighbors, rows=rows)
+        with stage_timer("rank"):
+            return rank_neighbors(query, snapshot, distances[0], indices[0], top_k)
+
+    except Exception as e:
+        print(f"Error in suggestions: {e}")
+        return []
+
+
+def get_suggestions_batch(queries, snapshot, top_k=8):
+    """ML suggestions for many queries with one vectorization and one similarity pass.
+
+    `top_k` is either one value for every query or a list with one value per
+    query; each query sees the same neighbour window as get_suggestions.
+    """
+    n_courses = len(snapshot.courses)
+    top_ks = list(top_k) if isinstance(top_k, (list, tuple)) else [top_k] * len(queries)
+    results = [[] for _ in queries]
+    active = [i for i, query in enumerate(queries) if query.strip()]
+    if not active or n_courses == 0:
+        return results
+
+    try:
+        X_query = vectorize_queries(snapshot, [queries[i] for i in active])
+        max_neighbors = min(max(top_ks[i] for i in active) * 2, n_courses)
+        with stage_timer("kneighbors"):
+            distances, indices = snapshot.engine.kneighbors(X_query, n_neighbors=max_neighbors)
+
+        with stage_timer("rank"):
+            for row, i in enumerate(active):
+                n_neighbors = min(top_ks[i] * 2, n_courses)
+                results[i] = rank_neighbors(queries[i], snapshot, distances[row, :n_neighbors],
+                                            indices[row, :n_neighbors], top_ks[i])
+        return results
+
+    except Exception as e:
+        print(f"Error in batch suggestions: {e}")
+        return results
+
+
+# ========== Rule stage ==========
+def rule_matches(snapshot, query, rows=None, substring=True):
+    """Rows with a rule score and their scores: 90 prefix, 70 word start, 30 substring.
+
+    Only `rows` are scored when given, so the cost follows the candidate
+    count. With substring=False only the prefix index is read: the 90 and
+    70 tiers come back without scanning any names.
+    """
+    courses = snapshot.courses
+    query_norm = normalize_text(query)
+    query_no_dots = query_norm.replace('.', '')
+    word_start_rows = snapshot.rule_index.word_start_rows(query_norm, query_no_dots)
+    prefix_rows = snapshot.rule_index.prefix_rows(query_norm, query_no_dots)
+
+    if substring:
+        course_norm = courses["course_norm"]
+        course_no_dots = courses["course_no_dots"]
+        candidates = np.arange(len(courses))
+        if rows is not None:
+            course_norm, course_no_dots, candidates = course_norm.iloc[rows], course_no_dots.iloc[rows], rows
+        found = (course_norm.str.contains(query_norm, regex=False) |
+                 course_no_dots.str.contains(query_no_dots, regex=False)).to_numpy(dtype=bool)
+        matched = candidates[found]
+    else:
+        # Both tiers are substring matches. A query with a space has no word starts (word keys hold
+        # no spaces) but can still be a prefix of a full name, so neither set covers the other.
+        matched = np.union1d(word_start_rows, prefix_rows)
+        if rows is not None:
+            matched = np.intersect1d(matched, rows)
+
+    # Later tiers overwrite earlier ones
+    scores = np.full(len(matched), RULE_SUBSTRING_SCORE, dtype=np.int64)
+    scores[np.isin(matched, word_start_rows)] = RULE_WORD_START_SCORE
+    scores[np.isin(matched, prefix_rows)] = RULE_PREFIX_SCORE
+    return matched, scores
+
+
+def session_candidates(snapshot, matched, query, rows=None):
+    """Rows any longer query extending this one could still match: the rule
+    matches plus ML-side substring matches (which skip abbreviation expansion)"""
+    courses = snapshot.courses
+    course_clean = courses["course_clean"] if rows is None else courses["course_clean"].iloc[rows]
+    candidates = np.arange(len(courses)) if rows is None else rows
+    ml_matched = candidates[course_clean.str.contains(clean_text(query), regex=False).to_numpy(dtype=bool)]
+    return np.union1d(matched, ml_matched)
+
+
+# ========== Merge and top-k ==========
+def merge_scores(merged, snapshot, rows, scores):
+    """Fold (row, score) pairs into `merged`, keyed on (name, id), keeping the higher score"""
+    courses = snapshot.courses
+    for item in zip(courses[COURSE_COL].to_numpy()[rows].tolist(),
+                    courses["id"].to_numpy()[rows].astype(int).tolist(),
+                    np.asarray(scores).tolist()):
+        merge_suggestion(merged, *item)
+
+
+def merge_suggestion(merged, name, course_id, score):
+    key = (name, course_id)
+    if key not in merged or score > merged[key]:
+        merged[key] = score
+
+
+def can_change_top_k(merged, limit, max_score):
+    """False once `limit` merged results score above `max_score`: a stage
+    adding scores no higher than that cannot move anything into the top-k"""
+    if len(merged) < limit:
+        return True
+    return heapq.nlargest(limit, merged.values())[-1] <= max_score
+
+
+def top_k(merged, limit, snapshot):
+    """The `limit` best merged results, ties in snapshot.partitions.rank order"""
+    if not merged:
+        return []
+    keys = list(merged)
+    scores = np.fromiter(merged.values(), dtype=np.float64, count=len(keys))
+    ranks = snapshot.partitions.id_ranks([cid for _, cid in keys])
+    return [(*keys[i], merged[keys[i]]) for i in np.lexsort((ranks, -scores))[:limit].tolist()]
+
+
+def result_path(suggestions, ml_scores):
+    """Which stages produced `suggestions`: "ml", "rule", "ml_rule" or "empty".
+
+    A result counts as ML when its merged score is its ML score (ties go to ML).
+    """
+    if not suggestions:
+        return "empty"
+    from_ml = sum(ml_scores.get((name, cid)) == score for name, cid, score in suggestions)
+    if from_ml == len(suggestions):
+        return "ml"
+    return "rule" if from_ml == 0 else "ml_rule"
+
+
+def suggestion_limit(query):
+    """Adjusted dynamic limit: more suggestions for short queries, 8 for "diploma" and longer"""
+    qlen = len(query)
+    if qlen <= 1:
+        return 30
+    elif qlen <= 3:
+        return 20
+    elif qlen <= 6:
+        return 10
+    else:
+        return 8  # Increased from 3 to 8 for queries like "diploma"
+
+
+def suggest(query, snapshot, limit, stages=None, rows=None, ml_suggestions=None, with_candidates=False,
+            partition=None):
+    """Top `limit` (name, id, score) suggestions for one query.
+
+    Returns (suggestions, candidates). `partition` (see
+    CatalogPartitions.rows) restricts every stage to a filtered part of the
+    catalog; `rows` further restricts ML and rule scoring to a session's
+    candidate rows within it. `ml_suggestions` passes in ML results already
+    computed in a batch. With with_candidates=True the rule stage
+    always scans and `candidates` holds the rows a longer query could still
+    match (see session_candidates); otherwise it is None.
+    """
+    stages = STAGES if stages is None else stages
+    merged = {}
+    if rows is None:
+        rows = partition
+
+    if "ml" in stages:
+        if ml_suggestions is None:
+            ml_suggestions = get_suggestions(query, snapshot, top_k=limit, rows=rows)
+        for suggestion in ml_suggestions:
+            merge_suggestion(merged, *suggestion)
+    ml_scores = dict(merged)
+
+    candidates = None
+    if "rule" in stages:
+        if with_candidates or can_change_top_k(merged, limit, RULE_PREFIX_SCORE):
+            scan = with_candidates or can_change_top_k(merged, limit, RULE_SUBSTRING_SCORE)
+            if not scan:
+                SKIPPED_STAGES.inc("substring")
+            with stage_timer("rule"):
+                matched, scores = rule_matches(snapshot, query, rows, substring=scan)
+                merge_scores(merged, snapshot, matched, scores)
+            if with_candidates:
+                with stage_timer("candidates"):
+                    candidates = session_candidates(snapshot, matched, query, rows)
+        else:
+            SKIPPED_STAGES.inc("rule")
+
+    with stage_timer("merge"):
+        suggestions = top_k(merged, limit, snapshot)
+
+    # Fuzzy fallback if no suggestions (abbreviation/typo handling): WRatio over
+    # the trigram-index shortlist instead of every course name
+    if not suggestions and "fuzzy" in stages:
+        with stage_timer("fuzzy"):
+            matches = snapshot.fuzzy_index.extract(query, limit, score_cutoff=FUZZY_CUTOFF, within=partition,
+                                                   tie_rank=snapshot.partitions.rank)
+            course_ids = snapshot.courses["id"].to_numpy()
+            suggestions = [(name, int(course_ids[idx]), score) for name, score, idx in matches]
+        record_path("fuzzy" if suggestions else "empty")
+    else:
+        record_path(result_path(suggestions, ml_scores))
+
+    return suggestions, candidates
+
+
+def suggest_batch(queries, snapshot, limits, stages=None):
+    """suggest() for many queries, with one ML vectorization and similarity pass for all of them"""
+    stages = STAGES if stages is None else stages
+    if "ml" in stages:
+        ml_batch = get_suggestions_batch(queries, snapshot, top_k=list(limits))
+    else:
+        ml_batch = [None] * len(queries)
+    return [suggest(query, snapshot, limit, stages, ml_suggestions=ml_suggestions)[0]
+            for query, limit, ml_suggestions in zip(queries, limits, ml_batch)]
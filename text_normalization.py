@@ -0,0 +1,29 @@
+# text_normalization.py
+import re
+
+ABBREV = {
+    'mgmt': 'management',
+    'engg': 'engineering',
+    'tech': 'technology',
+    'comm': 'commerce',
+    'sci': 'science',
+    'phy': 'physics',
+    'chem': 'chemistry',
+    'bio': 'biology',
+    # add more as needed
+}
+ABBREV_PATTERNS = [(re.compile(r'\b' + re.escape(abbr) + r'\b'), full) for abbr, full in ABBREV.items()]
+NON_ALNUM_PATTERN = re.compile(r'[^a-zA-Z0-9\s]')
+
+def normalize_text(text):
+    """Expand abbreviations, remove special chars, normalize spaces, lowercase"""
+    text = str(text).lower().strip()
+    for pattern, full in ABBREV_PATTERNS:
+        text = pattern.sub(full, text)
+    text = NON_ALNUM_PATTERN.sub('', text)
+    return " ".join(text.split())
+
+def clean_text(text):
+    """Remove special chars, normalize spaces, lowercase (no abbreviation expansion)"""
+    text = NON_ALNUM_PATTERN.sub('', str(text).lower().strip())
+    return " ".join(text.split())
@@ -1,37 +1,30 @@
 import pandas as pd
-import pickle
-from pathlib import Path
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.neighbors import NearestNeighbors
+from course_db import clean_courses
+from index_artifact import INDEX_DIR, write_index
+from suggestion_pipeline import fit_model
 
 
 # ===== Config =====
 DATA_PATH = "Courses.csv"   # Your CSV file
-OUT_DIR = Path("ml_suggestion_module")
-OUT_DIR.mkdir(exist_ok=True)
+# Same index layout and directory (COURSE_INDEX_DIR) as retrain_course_model.py, see index_artifact.py
+OUT_DIR = INDEX_DIR
 
 # ===== Load Data =====
 df = pd.read_csv(DATA_PATH)
-if "course_name" not in df.columns:
-    raise ValueError("CSV must contain 'course_name' column.")
-
-def preprocess(text: str) -> str:
-    """Lowercase, strip, normalize spaces."""
-    return " ".join(str(text).lower().strip().split())
-
-df["course_preproc"] = df["course_name"].apply(preprocess)
-
-# ===== Train TF-IDF Vectorizer =====
-vectorizer = TfidfVectorizer(analyzer="char_wb", ngram_range=(2,4))
-X = vectorizer.fit_transform(df["course_preproc"])
-
-# ===== Train Nearest Neighbors =====
-nn = NearestNeighbors(n_neighbors=10, metric="cosine", algorithm="brute")
-nn.fit(X)
+if "course_name" not in df.columns or "id" not in df.columns:
+    raise ValueError("CSV must contain 'id' and 'course_name' columns.")
+if "status" in df.columns:
+    df = df[df["status"] == "Active"]
+# Same rows and order as the DB catalog: active courses in id order, de-duplicated
+# degree_id and sequence are kept for filtered search and ordering (see catalog_partitions.py)
+columns = [column for column in ("id", "course_name", "degree_id", "sequence") if column in df.columns]
+df = clean_courses(df[columns].sort_values("id", kind="stable"))
+
+# ===== Train TF-IDF Vectorizers =====
+# Shared with retrain_course_model.py and the query path, so names and queries are normalized alike
+char_vectorizer, word_vectorizer, X = fit_model(df["course_name"].tolist())
 
 # ===== Save Artifacts =====
-pickle.dump(vectorizer, open(OUT_DIR / "vectorizer.pkl", "wb"))
-pickle.dump(nn, open(OUT_DIR / "nn_model.pkl", "wb"))
-df[["course_name", "course_preproc"]].to_csv(OUT_DIR / "courses_lookup.csv", index=False)
+manifest = write_index(char_vectorizer, word_vectorizer, X, df, OUT_DIR)
 
-print(f"✅ Model trained and saved in: {OUT_DIR}")
+print(f"✅ Model trained on {len(df)} courses and saved in: {OUT_DIR / manifest['build']}")
@@ -0,0 +1,118 @@
+# trigram_index.py
+from math import ceil
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+from prefix_index import encode
+from text_normalization import clean_text
+
+# A candidate must share at least this share of the query's n-grams
+MIN_OVERLAP = 0.2
+# At most this many candidates (highest overlap first) are scored with WRatio;
+# catalogs no larger than this are always scanned in full
+MAX_CANDIDATES = 2000
+# Queries up to this many cleaned characters are matched on bigrams: a typo
+# in a short word often leaves no trigram in common with the intended name
+SHORT_QUERY_CHARS = 5
+# Shortlists at least this long are scored on all cores
+PARALLEL_MIN_CANDIDATES = 20000
+
+
+def ngrams(text, n=3):
+    """Character n-grams of the cleaned text, padded so word edges count"""
+    text = f" {clean_text(text)} "
+    return {text[i:i + n] for i in range(len(text) - n + 1)} if text.strip() else set()
+
+
+class TrigramIndex:
+    """Character n-gram inverted index that shortlists names for the fuzzy fallback.
+
+    Trigram postings (plus bigram postings for short queries) live in one
+    int array, sliced by the position of each n-gram in a sorted bytes
+    array; a query counts how many of its n-grams each row shares (one
+    bincount) and keeps the rows with enough overlap, so WRatio only runs on
+    a short candidate list instead of the whole catalog. The arrays are
+    stored in each index build and come back memory-mapped through
+    from_arrays().
+    """
+    ARRAYS = ("grams", "gram_starts", "postings", "length_penalty")
+
+    def __init__(self, names):
+        self.names = np.asarray(names, dtype=object)
+        postings = {}
+        lengths = []
+        for row, name in enumerate(self.names):
+            lengths.append(len(clean_text(name)))
+            for gram in ngrams(name, 2) | ngrams(name, 3):
+                postings.setdefault(encode(gram), []).append(row)
+        # Between 0 and 1: breaks overlap ties in favour of shorter names, which WRatio scores higher
+        self._length_penalty = np.asarray(lengths, dtype=np.float64) / (max(lengths, default=0) + 1)
+        grams = sorted(postings)
+        self._grams = np.array(grams, dtype=bytes)
+        self._gram_starts = np.zeros(len(grams) + 1, dtype=np.int64)
+        np.cumsum([len(postings[gram]) for gram in grams], out=self._gram_starts[1:])
+        self._postings = np.fromiter(
+            (row for gram in grams for row in postings[gram]), dtype=np.int64, count=self._gram_starts[-1]
+        )
+
+    @classmethod
+    def from_arrays(cls, arrays, names):
+        """Index of `names` over the arrays() of one built from the same names"""
+        index = cls.__new__(cls)
+        index.names = np.asarray(names, dtype=object)
+        for name in cls.ARRAYS:
+            setattr(index, f"_{name}", arrays[name])
+        return index
+
+    def arrays(self):
+        """{name: array} for every name in ARRAYS"""
+        return {name: getattr(self, f"_{name}") for name in self.ARRAYS}
+
+    def __len__(self):
+        return len(self.names)
+
+    def shortlist(self, query, min_overlap=None, max_candidates=None):
+        """Candidate rows for `query` in row order, or None when the whole catalog should be scanned"""
+        min_overlap = MIN_OVERLAP if min_overlap is None else min_overlap
+        max_candidates = MAX_CANDIDATES if max_candidates is None else max_candidates
+        query_clean = clean_text(query)
+        if len(self.names) <= max_candidates or not query_clean:
+            return None
+        grams = ngrams(query_clean, 2 if len(query_clean.replace(" ", "")) <= SHORT_QUERY_CHARS else 3)
+        if not grams or len(self._grams) == 0:
+            return np.empty(0, dtype=np.int64)
+        keys = np.array([encode(gram) for gram in grams], dtype=bytes)
+        at = np.minimum(self._grams.searchsorted(keys), len(self._grams) - 1)
+        found = [self._postings[self._gram_starts[i]:self._gram_starts[i + 1]] for i in at[self._grams[at] == keys]]
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        counts = np.bincount(np.concatenate(found), minlength=len(self.names))
+        rows = np.flatnonzero(counts >= max(1, ceil(min_overlap * len(grams))))
+        if len(rows) > max_candidates:
+            rank = counts[rows] - self._length_penalty[rows]
+            rows = np.sort(rows[np.argpartition(-rank, max_candidates - 1)[:max_candidates]])
+        return rows
+
+    def extract(self, query, limit, score_cutoff=0, rows=None, within=None, tie_rank=None):
+        """Like process.extract(query, names, scorer=fuzz.WRatio, limit=limit), over the shortlist only.
+
+        Returns (name, score, row) tuples, best first and ties in row order
+        (or in `tie_rank` order, a per-row array). `rows` skips the shortlist
+        and scores exactly those rows; `within` (sorted rows) keeps only the
+        shortlisted rows among them.
+        """
+        if rows is None:
+            rows = self.shortlist(query)
+            if within is not None:
+                rows = within if rows is None else np.intersect1d(rows, within, assume_unique=True)
+        if rows is None:
+            rows = np.arange(len(self.names))
+        if len(rows) == 0 or limit <= 0:
+            return []
+        workers = -1 if len(rows) >= PARALLEL_MIN_CANDIDATES else 1
+        scores = process.cdist([query], self.names[rows], scorer=fuzz.WRatio, dtype=np.float64,
+                               score_cutoff=score_cutoff, workers=workers)[0]
+        order = np.lexsort((rows if tie_rank is None else tie_rank[rows], -scores))[:limit]
+        return [(self.names[rows[i]], float(scores[i]), int(rows[i]))
+                for i in order if scores[i] >= score_cutoff]
@@ -0,0 +1,12 @@
+# wsgi.py
+"""WSGI entry point for production servers.
+
+    gunicorn -c gunicorn.conf.py
+
+The catalog and index are loaded here, once, in the parent process; forked
+workers inherit the snapshot and the memory-mapped index pages. Workers
+start their own course monitor or index follower after the fork.
+"""
+from ml_api import app, init
+
+init(monitor=False)